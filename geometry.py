@@ -5,23 +5,240 @@
 Программа генерирует 3D-геометрию в CAE-платформе Salome
 """
 
-from tkinter import (Tk, Toplevel, Menu, Frame, Text, Label, Button, Entry,
-                     Scrollbar, END, YES, TOP, RIGHT, LEFT, X, Y, W, BOTH,
-                     INSERT)
+import argparse
+import json
+import sys
+import time
+import numpy as np
 
-import csv
-import salome
-salome.salome_init()
-import GEOM
-from salome.geom import geomBuilder
-geompy = geomBuilder.New()
-gg = salome.ImportComponentGUI("GEOM")
-import salome_notebook
-notebook = salome_notebook.notebook
+DIMENSION = '3D'  # размерность задачи по умолчанию
+MATRIX = 100.  # размер матрицы по умолчанию
+
+
+def salome_geometry(gui=True):
+    """
+    Инициализация Salome: построитель геометрии geompy и (при gui)
+    графический интерфейс модуля GEOM.
+
+    """
+
+    import salome
+    salome.salome_init()
+    from salome.geom import geomBuilder
+
+    geompy = geomBuilder.New()
+    gg = salome.ImportComponentGUI("GEOM") if gui else None
+
+    return geompy, gg
+
+
+class StubObject():
+    """Геометрический объект заменителя построителя геометрии."""
+
+    def __init__(self, method, args):
+        self.method = method
+        self.args = args
+
+    def __repr__(self):
+        return '<{0}>'.format(self.method)
+
+
+class RecordingGeomBuilder():
+    """
+    Заменитель построителя геометрии geomBuilder (без Salome): любой
+    вызов метода записывается (имя) и возвращает StubObject. Позволяет
+    проверять конвейер построения геометрии (порядок и кол-во вызовов);
+    время построения геометрии в Salome по нему не оценивается.
+
+    """
+
+    def __init__(self):
+        self.calls = []  # имена вызванных методов
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        def method(*args, **kwargs):
+            self.calls.append(name)
+            return StubObject(name, args)
+
+        return method
+
+    def summary(self):
+        """Кол-во вызовов по методам."""
+
+        table = {}
+        for name in self.calls:
+            table[name] = table.get(name, 0) + 1
+
+        return table
+
+
+def load_particles(file):
+    """
+    Загрузить частицы (массив строк x, y, z, d) и заголовок (словарь:
+    размерность dim, размер матрицы matrix и др.) из файла
+    распределения: .npz (массивы particles и metadata) либо TSV (без
+    заголовка).
+
+    """
+
+    if file.lower().endswith('.npz'):
+        with np.load(file) as archive:
+            header = json.loads(str(archive['metadata'])) \
+                if 'metadata' in archive.files else {}
+            return np.asarray(archive['particles'],
+                              dtype=np.float64), header
+
+    return np.loadtxt(file, delimiter='\t', ndmin=2), {}
+
+
+def model_parameters(header, dimension=None, matrix=None):
+    """
+    Размерность ('2D' либо '3D') и размер матрицы: заданные значения,
+    иначе - из заголовка файла распределения, иначе - по умолчанию.
+
+    """
+
+    if dimension is None:
+        dimension = '{0}D'.format(header['dim']) if 'dim' in header \
+            else DIMENSION
+    if matrix is None:
+        matrix = float(header.get('matrix', MATRIX))
+
+    return dimension, matrix
+
+
+def build(geompy, data, matrix, dimension='3D', chunk=1000, register=False,
+          listener=None):
+    """
+    Построить геометрическую модель: матрица и частицы data (массив
+    строк x, y, z, d). Частицы объединяются в составные объекты
+    (compound) по chunk штук, которые затем объединяются с матрицей.
+
+    register - добавлять в проект каждую частицу (в проект всегда
+    добавляются матрица, составные объекты пакетов и итоговый объект).
+    listener - обработчик сообщений о ходе построения.
+
+    Возвращает итоговый объект (2D - разбиение, 3D - составной объект)
+    и его идентификатор в проекте.
+
+    """
+
+    notify = listener or (lambda message: None)
+
+    if dimension == '2D':
+        # создать прямоугольник в плоскости OXY и переместить его
+        face = geompy.MakeFaceHW(matrix, matrix, 1)
+        base = geompy.MakeTranslation(face, matrix / 2, matrix / 2, 0)
+
+        p0 = geompy.MakeVertex(0., 0., 0.)
+        pz = geompy.MakeVertex(0., 0., 1.)
+        vz = geompy.MakeVector(p0, pz)
+
+        geompy.addToStudy(face, "Face")
+        geompy.addToStudy(base, "Translation")
+        geompy.addToStudy(vz, "V_Z")
+    else:  # 3D
+        # создать прямоугольный параллелепипед
+        base = geompy.MakeBoxDXDYDZ(matrix, matrix, matrix)
+        geompy.addToStudy(base, "Box")
+
+    compounds = []  # составные объекты пакетов частиц
+    for low in range(0, len(data), chunk):
+        particles = []
+        for number, (px, py, pz, diameter) in enumerate(
+                data[low:low + chunk].tolist(), start=low):
+            if dimension == '2D':
+                point = geompy.MakeVertex(px, py, pz)
+                particle = geompy.MakeCircle(point, vz, diameter / 2)
+                name = "Circle_{0}".format(number)
+            else:  # 3D
+                particle = geompy.MakeSphere(px, py, pz, diameter / 2)
+                name = "Sphere_{0}".format(number)
+            particles.append(particle)
+
+            if register:
+                geompy.addToStudy(particle, name)
+
+        compound = geompy.MakeCompound(particles)
+        geompy.addToStudy(compound, "Particles_{0}".format(len(compounds)))
+        compounds.append(compound)
+
+        notify('Построено частиц: {0} из {1}'.format(
+            min(low + chunk, len(data)), len(data)))
+
+    if dimension == '2D':
+        # создать разбиение
+        entity = geompy.MakePartition([base], compounds)
+        entity_id = geompy.addToStudy(entity, "Partition")
+    else:  # 3D
+        # создать набор геометрических объектов
+        entity = geompy.MakeCompound([base] + compounds)
+        entity_id = geompy.addToStudy(entity, "Compound")
+
+    return entity, entity_id
+
+
+def batch(argv=None):
+    """Пакетный режим: построение геометрии и экспорт без окна."""
+
+    parser = argparse.ArgumentParser(
+        description='Создание геометрической модели в Salome')
+    parser.add_argument('file', help='файл распределения частиц '
+                        '(.npz либо .tsv)')
+    parser.add_argument('--dimension', choices=('2D', '3D'),
+                        help='размерность (по умолчанию - из заголовка '
+                        'файла .npz, иначе {0})'.format(DIMENSION))
+    parser.add_argument('--matrix', type=float,
+                        help='размер матрицы (по умолчанию - из заголовка '
+                        'файла .npz, иначе {0:g})'.format(MATRIX))
+    parser.add_argument('--chunk', type=int, default=1000,
+                        help='кол-во частиц в составном объекте')
+    parser.add_argument('--register', action='store_true',
+                        help='добавлять в проект каждую частицу')
+    parser.add_argument('--step', help='файл экспорта STEP')
+    parser.add_argument('--stub', action='store_true',
+                        help='заменитель построителя геометрии (без Salome)')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.stub:
+        geompy = RecordingGeomBuilder()
+    else:
+        geompy, _ = salome_geometry(gui=False)
+
+    data, header = load_particles(args.file)
+    dimension, matrix = model_parameters(header, args.dimension, args.matrix)
+    print('Загружен файл исходных данных: {0:s} (частиц: {1})'.format(
+        args.file, len(data)))
+    print('Размерность = {0}, размер матрицы = {1:g}'.format(
+        dimension, matrix))
+
+    entity, _ = build(geompy, data, matrix, dimension, args.chunk,
+                      args.register, listener=print)
+
+    if args.step:
+        geompy.ExportSTEP(entity, args.step)
+        print('Геометрия экспортирована в файл: {0:s}'.format(args.step))
+
+    if args.stub:
+        for name, count in sorted(geompy.summary().items()):
+            print('{0}: вызовов = {1}'.format(name, count))
+    print('Время = {0:.3f} с'.format(time.perf_counter() - start))
+    if args.stub:
+        print('(заменитель построителя: время Salome не учитывается)')
+
+    return entity
 
 
 class Application():
-    """Программа."""
+    """
+    Программа (графический интерфейс Tk; имена модуля tkinter
+    импортируются при запуске окна, см. __main__).
+
+    """
 
     # параметры текстовой консоли
     WIDTH_GUI = 50  # ширина
@@ -31,8 +248,8 @@ class Application():
         master.title('Создание геометрической модели')
 
         self.options = {
-            'dimension': '3D',
-            'matrix': 100,
+            'dimension': DIMENSION,
+            'matrix': MATRIX,
             'work_dir': '/home/vatnik/',
             'file_name': '3D',
             'extension': '.tsv'
@@ -44,6 +261,9 @@ class Application():
         self.ORDER = 'dimension', 'matrix', 'work_dir',
         'file_name', 'extension'  # порядок следования
 
+        self.geompy, self.gg = salome_geometry()
+        self.entity = None  # построенная геометрическая модель
+
         self.create_widgets(master)
 
     def msg(self, message):
@@ -127,107 +347,46 @@ class Application():
     def creation(self):
         """Создание геометрической модели."""
 
-        data = []
         open_file = self.options['work_dir'] + self.options['file_name'] +\
             self.options['extension']
-        with open(open_file, 'r') as f:
-            csv_reader = csv.reader(f, delimiter='\t')
-            for row in csv_reader:
-                row_data = []
-                for i in map(float, row):
-                    row_data.append(i)
-                data.append(row_data)
-            self.msg('Загружен файл исходных данных: {0:s}'.format(open_file))
-
+        data, header = load_particles(open_file)
+        self.msg('Загружен файл исходных данных: {0:s}'.format(open_file))
+        if header:  # параметры модели - из заголовка файла
+            self.options['dimension'], self.options['matrix'] = \
+                model_parameters(header)
+            self.msg('Размерность = {0}, размер матрицы = {1:g} '
+                     '(из заголовка файла)'.format(
+                         self.options['dimension'], self.options['matrix']))
+
+        self.entity, entity_id = build(
+            self.geompy, data, self.options['matrix'],
+            self.options['dimension'], register=True, listener=self.msg)
+
+        # показать результаты
+        self.gg.createAndDisplayGO(entity_id)
         if self.options['dimension'] == '2D':
-            points = []  # точки
-            circles = []  # окружности
-
-            # создать прямоугольник в плоскости OXY
-            face = geompy.MakeFaceHW(
-                self.options['matrix'], self.options['matrix'], 1)
-
-            # переместить прямоугольник
-            translation = geompy.MakeTranslation(
-                face, self.options['matrix']/2, self.options['matrix']/2, 0)
-
-            # создать окружности
-            p0 = geompy.MakeVertex(0., 0., 0.)
-            pz = geompy.MakeVertex(0., 0., 1.)
-            vz = geompy.MakeVector(p0, pz)
-
-            for d in data:
-                (px, py, pz, radius) = d
-                point = geompy.MakeVertex(px, py, pz)
-                points.append(point)
-                circles.append(geompy.MakeCircle(point, vz, radius))
-
-            # создать разбиение
-            global partition
-            partition = geompy.MakePartition([translation], circles)
-
-            # добавить объекты в проект
-            id_face = geompy.addToStudy(face, "Face")
-            id_translation = geompy.addToStudy(translation, "Translation")
-            id_vector = geompy.addToStudy(vz, "V_Z")
-
-            for number, circle in enumerate(circles):
-                id_circle = geompy.addToStudy(
-                    circle, "Circle_{0}".format(number))
-
-            id_partition = geompy.addToStudy(partition, "Partition")
-
-            # показать результаты
-            gg.createAndDisplayGO(id_partition)
+            import salome
             salome.sg.ViewTop()  # вид сверху
 
-        else:  # 3D
-            spheres = []  # шары
-
-            # создать прямоугольный параллелепипед
-            box = geompy.MakeBoxDXDYDZ(
-                self.options['matrix'], self.options['matrix'],
-                self.options['matrix'])
-
-            # создать шары
-            for d in data:
-                (px, py, pz, radius) = d
-                sphere = geompy.MakeSphere(px, py, pz, radius)
-                spheres.append(sphere)
-
-            # создать набор геометрических объектов
-            global compound
-            compound = geompy.MakeCompound([box] + spheres)
-
-            # добавить объекты в проект
-            id_box = geompy.addToStudy(box, "Box")
-
-            for number, sphere in enumerate(spheres):
-                id_sphere = geompy.addToStudy(
-                    sphere, "Sphere_{0}".format(number))
-
-            id_compound = geompy.addToStudy(compound, "Compound")
-
-            # показать результаты
-            gg.createAndDisplayGO(id_compound)
-
     def save(self):
         """Сохранение геометрической модели в файл."""
 
-        if self.options['dimension'] == '2D':
-            entity = partition
-        else:  # 3D
-            entity = compound
-
         exported_file = self.options['work_dir'] +\
             self.options['file_name'] + '.step'
-        geompy.ExportSTEP(entity, exported_file)
+        self.geompy.ExportSTEP(self.entity, exported_file)
         self.msg(
             'Геометрия экспортирована в файл: {0:s}'.format(exported_file))
 
 
 if __name__ == '__main__':
 
-    root = Tk()
-    app = Application(root)
-    root.mainloop()
+    if len(sys.argv) > 1:  # пакетный режим
+        batch()
+    else:
+        # Tk - только в графическом режиме (пакетному режиму не нужен)
+        from tkinter import (Tk, Toplevel, Menu, Frame, Text, Label, Button,
+                             Entry, Scrollbar, END, YES, TOP, RIGHT, LEFT, X,
+                             Y, W, BOTH, INSERT)
+        root = Tk()
+        app = Application(root)
+        root.mainloop()
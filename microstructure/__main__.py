@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Пакетный расчёт из командной строки: python -m microstructure config.json
+"""
+
+import os
+import sys
+
+# модули программы импортируются из её каталога
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cli
+
+sys.exit(cli.main())
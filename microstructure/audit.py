@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль проверки объединённого распределения частиц (пересечения, зазоры,
+граничное отталкивание)
+"""
+
+import itertools
+import time
+import numpy as np
+import shapes
+
+# виды нарушений для пар частиц
+OVERLAP = 0  # частицы пересекаются
+GAP = 1  # расстояние между частицами меньше зазора
+
+# виды нарушений для отдельных частиц
+OUTSIDE = 0  # частица (при var_ind == 1 - центр) вне матрицы
+REPULSION = 1  # нарушено граничное отталкивание
+
+
+class AuditReport:
+    """Результат проверки распределения частиц."""
+
+    def __init__(self):
+        self.particles = 0  # кол-во проверенных частиц
+        self.candidates = 0  # кол-во проверенных пар соседних частиц
+        self.pairs = np.empty((0, 2), dtype=np.int64)  # пары частиц
+        self.kinds = np.empty(0, dtype=np.int8)  # OVERLAP либо GAP
+        self.depth = np.empty(0)  # недостаток расстояния до допустимого
+        self.boundary = np.empty(0, dtype=np.int64)  # индексы частиц
+        self.boundary_kinds = np.empty(0, dtype=np.int8)  # OUTSIDE, REPULSION
+        self.elapsed = 0.
+
+    def __str__(self):
+        return 'audit: particles={0}, candidates={1}, overlaps={2}, ' \
+            'gaps={3}, outside={4}, repulsion={5}'.format(
+                self.particles, self.candidates,
+                self.count(OVERLAP), self.count(GAP),
+                self.count(OUTSIDE, boundary=True),
+                self.count(REPULSION, boundary=True))
+
+    def count(self, kind, boundary=False):
+        """Кол-во нарушений вида kind."""
+
+        kinds = self.boundary_kinds if boundary else self.kinds
+        return int(np.count_nonzero(kinds == kind))
+
+    def ok(self):
+        """Нарушений нет."""
+
+        return len(self.kinds) == 0 and len(self.boundary_kinds) == 0
+
+    def worst(self, number=10):
+        """Пары с наибольшими нарушениями (индексы в pairs)."""
+
+        return np.argsort(-self.depth, kind='stable')[:number]
+
+
+def _half_offsets(dim):
+    """Смещения соседних ячеек (каждая пара ячеек учитывается один раз)."""
+
+    return [offset for offset in itertools.product((-1, 0, 1), repeat=dim)
+            if any(offset) and offset[next(
+                k for k, o in enumerate(offset) if o)] > 0]
+
+
+def _cell_pairs(lengths_a, lengths_b):
+    """
+    Номера частиц внутри пар ячеек: для пары k перебираются все
+    lengths_a[k] x lengths_b[k] сочетаний.
+
+    """
+
+    sizes = lengths_a * lengths_b
+    pair = np.repeat(np.arange(len(sizes)), sizes)
+    local = np.arange(pair.size) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+
+    return pair, local // lengths_b[pair], local % lengths_b[pair]
+
+
+def neighbour_pairs(points, interaction, period=None, chunk=2 ** 20):
+    """
+    Пары частиц в соседних ячейках сетки размера interaction (пакетами
+    не более ~chunk пар, генератор массивов k x 2).
+
+    Ячейки строятся сортировкой линейных индексов ячеек частиц, пары
+    ячеек находятся двоичным поиском (np.searchsorted).
+
+    """
+
+    n, dim = points.shape
+    if n < 2:
+        return
+
+    if period is not None:
+        ncells = max(int(period // interaction), 1)
+        if ncells < 3:
+            ncells = 1  # соседние ячейки совпадали бы через период
+        keys = np.floor(points / (period / ncells)).astype(np.int64) % ncells
+        shape = (ncells,) * dim
+    else:
+        keys = np.floor(points / interaction).astype(np.int64)
+        keys -= keys.min(axis=0)
+        shape = tuple(keys.max(axis=0) + 1)
+
+    linear = np.ravel_multi_index(tuple(keys.T), shape)
+    del keys
+    order = np.argsort(linear, kind='stable')
+    cells, starts, lengths = np.unique(
+        linear[order], return_index=True, return_counts=True)
+    del linear
+    cell_keys = np.column_stack(np.unravel_index(cells, shape))
+
+    # пары ячеек: ячейка с собой и с соседями
+    first = [np.arange(len(cells))]
+    second = [np.arange(len(cells))]
+    if period is None or shape[0] > 1:
+        for offset in _half_offsets(dim):
+            neighbour = cell_keys + offset
+            if period is not None:
+                neighbour %= shape[0]
+                valid = np.ones(len(cells), dtype=bool)
+            else:
+                valid = np.all((neighbour >= 0) & (neighbour < shape),
+                               axis=1)
+            neighbour_linear = np.ravel_multi_index(
+                tuple(neighbour[valid].T), shape)
+            position = np.minimum(np.searchsorted(cells, neighbour_linear),
+                                  len(cells) - 1)
+            found = cells[position] == neighbour_linear
+            first.append(np.flatnonzero(valid)[found])
+            second.append(position[found])
+
+    first = np.concatenate(first)
+    second = np.concatenate(second)
+    same = first == second
+
+    # разбиение пар ячеек на пакеты
+    sizes = lengths[first] * lengths[second]
+    bounds = np.searchsorted(np.cumsum(sizes),
+                             np.arange(chunk, sizes.sum() + chunk, chunk),
+                             side='right')
+    bounds = np.unique(np.concatenate(([0], bounds, [len(sizes)])))
+
+    for low, high in zip(bounds[:-1], bounds[1:]):
+        a, b = first[low:high], second[low:high]
+        pair, i, j = _cell_pairs(lengths[a], lengths[b])
+        i = starts[a[pair]] + i
+        j = starts[b[pair]] + j
+        keep = ~same[low:high][pair] | (i < j)
+        yield np.column_stack((order[i[keep]], order[j[keep]]))
+
+
+def describe(report, particles, number=5):
+    """Строки сообщения о результатах проверки для текстовой консоли."""
+
+    if report.ok():
+        return ['<font color="green">Проверка распределения: нарушений '
+                'нет ({0} частиц, {1:.3f} с)</font>'.format(
+                    report.particles, report.elapsed)]
+
+    lines = ['<font color="red">Проверка распределения: пересечений = {0}, '
+             'нарушений зазора = {1}, вне матрицы = {2}, граничное '
+             'отталкивание = {3}</font>'.format(
+                 report.count(OVERLAP), report.count(GAP),
+                 report.count(OUTSIDE, boundary=True),
+                 report.count(REPULSION, boundary=True))]
+
+    for k in report.worst(number):
+        i, j = report.pairs[k]
+        lines.append('{0} ({1}) - ({2}), недостаёт {3:.4g}'.format(
+            'пересечение' if report.kinds[k] == OVERLAP else 'зазор',
+            particles[int(i)], particles[int(j)], report.depth[k]))
+
+    return lines
+
+
+def audit(options, particles, chunk=2 ** 20, tolerance=None):
+    """
+    Проверить распределение частиц (ParticleSet либо массив строк
+    x, y, z, d) на пересечения, нарушения зазора options['gap'] и
+    границ матрицы (с учётом options['var_ind'] и граничного
+    отталкивания).
+
+    Пары соседних частиц перебираются по ячейкам сетки пакетами
+    не более ~chunk пар. tolerance - допуск сравнения расстояний
+    (по умолчанию 1e-9 размера матрицы). Возвращает AuditReport.
+
+    """
+
+    start = time.perf_counter()
+
+    dim = options['dim_ind'] + 2
+    if not isinstance(particles, shapes.ParticleSet):
+        particles = shapes.ParticleSet.from_array(particles, dim=dim)
+
+    edge = options['matrix']
+    gap = options['gap']
+    periodic = options['var_ind'] == 2
+    if tolerance is None:
+        tolerance = 1e-9 * edge
+
+    points = np.ascontiguousarray(particles.points()[:, :dim])
+    diameters = np.ascontiguousarray(particles.d)
+
+    report = AuditReport()
+    report.particles = len(diameters)
+
+    pairs, kinds, depth = [], [], []
+    if len(diameters) > 1:
+        interaction = np.max(diameters) + gap
+        for candidates in neighbour_pairs(
+                points, interaction, edge if periodic else None, chunk):
+            i, j = candidates[:, 0], candidates[:, 1]
+            delta = points[j] - points[i]
+            if periodic:
+                delta -= edge * np.round(delta / edge)
+            distance = np.sqrt(np.einsum('ij,ij->i', delta, delta))
+            contact = (diameters[i] + diameters[j]) / 2
+
+            report.candidates += len(candidates)
+            bad = distance < contact + gap - tolerance
+            if np.any(bad):
+                pairs.append(np.sort(candidates[bad], axis=1))
+                kinds.append(np.where(
+                    distance[bad] < contact[bad] - tolerance, OVERLAP,
+                    GAP).astype(np.int8))
+                depth.append(contact[bad] + gap - distance[bad])
+
+    if pairs:
+        report.pairs = np.concatenate(pairs)
+        report.kinds = np.concatenate(kinds)
+        report.depth = np.concatenate(depth)
+
+    # границы матрицы
+    if not periodic:
+        radius = diameters[:, None] / 2
+        if options['var_ind'] == 0:  # частицы целиком в матрице
+            outside = np.any((points - radius < -tolerance) |
+                             (points + radius > edge + tolerance), axis=1)
+        else:  # центры частиц в матрице
+            outside = np.any((points < -tolerance) |
+                             (points > edge + tolerance), axis=1)
+
+        repulsion = options['boundary_repulsion'] / 100 * radius
+        distance = np.minimum(points, edge - points)
+        band = np.any((radius - repulsion < distance) &
+                      (distance < radius + repulsion), axis=1)
+
+        report.boundary = np.concatenate(
+            (np.flatnonzero(outside), np.flatnonzero(band & ~outside)))
+        report.boundary_kinds = np.concatenate(
+            (np.full(np.count_nonzero(outside), OUTSIDE, dtype=np.int8),
+             np.full(np.count_nonzero(band & ~outside), REPULSION,
+                     dtype=np.int8)))
+
+    report.elapsed = time.perf_counter() - start
+
+    return report
+
+
+if __name__ == '__main__':
+
+    opt = {'dim_ind': 1, 'var_ind': 1, 'matrix': 100., 'gap': 1.,
+           'boundary_repulsion': 20}
+
+    ps = shapes.ParticleSet(dim=3)
+    ps.add(10., 10., 10., 10.)
+    ps.add(19., 10., 10., 10.)  # пересечение
+    ps.add(29.5, 10., 10., 10.)  # зазор меньше допустимого
+    ps.add(50., 50., 50., 10.)
+    ps.add(95., 50., 50., 10.)  # граничное отталкивание
+
+    rep = audit(opt, ps)
+    print(rep)
+    print(rep.pairs, rep.kinds, rep.depth)
+    print(rep.boundary, rep.boundary_kinds)
+    print('\n'.join(describe(rep, ps)))
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль фонового потока расчёта распределения частиц (PyQt5)
+"""
+
+import copy
+import numpy as np
+from PyQt5 import QtCore
+import placement
+import random_creation
+
+
+class Worker(QtCore.QThread):
+    """
+    Фоновый поток расчёта распределения частиц.
+
+    Ход расчёта передаётся сигналами message и status, результат -
+    сигналом done (набор частиц, отчёт), ошибка расчёта - сигналом
+    error (текст). По окончании потока (в том числе при ошибке)
+    испускается сигнал QThread.finished. Остановка - через token.
+    seed - зерно расчёта (при одинаковом зерне результат повторяется).
+
+    """
+
+    message = QtCore.pyqtSignal(str)
+    status = QtCore.pyqtSignal(str)
+    done = QtCore.pyqtSignal(object, object)
+    error = QtCore.pyqtSignal(str)
+
+    def __init__(self, options, particles, seed):
+        super().__init__()
+        self.options = copy.deepcopy(options)  # не меняются во время расчёта
+        self.particles = particles
+        self.seed = seed
+        self.token = placement.CancelToken()
+
+    def run(self):
+        sink = random_creation.ConsoleSink(
+            self.options, self.message.emit, self.status.emit)
+        try:
+            particles, report = placement.generate(
+                self.options, self.particles, listener=sink, stop=self.token,
+                rng=np.random.default_rng(self.seed))
+        except Exception as exception:
+            # исключение не должно завершать поток без уведомления
+            self.error.emit('{0}: {1}'.format(
+                type(exception).__name__, exception))
+            return
+        finally:
+            sink.flush()
+
+        self.done.emit(particles, report)
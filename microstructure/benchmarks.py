@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль измерения производительности на больших распределениях частиц
+
+Запуск: python benchmarks.py [имя ...] [-n кол-во частиц]
+(без имён - все измерения). Демонстрации модулей (блоки __main__)
+остаются небольшими; файлы измерений записываются во временный
+каталог, который удаляется по окончании.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+
+
+def random_particles(n, edge, low=1., high=1., choice=None, dim=3, seed=1):
+    """
+    Массив строк x, y, z, d: n случайных частиц в матрице edge;
+    диаметры - из интервала [low, high) либо из набора choice.
+
+    """
+
+    rng = np.random.default_rng(seed)
+    array = np.zeros((n, 4))
+    array[:, :dim] = rng.random((n, dim)) * edge
+    if choice is None:
+        array[:, 3] = low + (high - low) * rng.random(n)
+    else:
+        array[:, 3] = rng.choice(choice, n)
+
+    return array
+
+
+def bench_audit(directory, n=1000000):
+    """Проверка распределения (audit.audit)."""
+
+    import audit
+
+    array = random_particles(n, 1000.)
+    report = audit.audit({'dim_ind': 1, 'var_ind': 1, 'matrix': 1000.,
+                          'gap': 1., 'boundary_repulsion': 20}, array)
+    print(report, 'time={0:.2f} s'.format(report.elapsed))
+
+
+def bench_particle_files(directory, n=1000000):
+    """Чтение и запись файлов распределений (TSV, .npz)."""
+
+    import particle_files
+    import shapes
+
+    ps = shapes.ParticleSet.from_array(random_particles(n, 100., 1., 2.))
+
+    name = os.path.join(directory, 'particles.tsv')
+    particle_files.save_tsv(name, ps)
+    start = time.perf_counter()
+    loaded, sizes, _ = particle_files.load([name, name])
+    print('tsv:', loaded, sizes,
+          'time={0:.2f} s'.format(time.perf_counter() - start))
+
+    binary = os.path.join(directory, 'particles.npz')
+    particle_files.save(binary, ps, particle_files.metadata(
+        {'dim_ind': 1, 'matrix': 100.}))
+    start = time.perf_counter()
+    array, _ = particle_files.open_npz(binary)
+    print('npz (memmap):', array.shape,
+          'time={0:.4f} s'.format(time.perf_counter() - start))
+    del array
+
+    start = time.perf_counter()
+    loaded, sizes, _ = particle_files.load(binary)
+    print('npz:', loaded, sizes,
+          'time={0:.2f} s'.format(time.perf_counter() - start))
+
+
+def bench_sections(directory, n=1000000):
+    """Профиль сечений (sections.profile)."""
+
+    import sections
+
+    array = random_particles(n, 1000., 5., 10.)
+    start = time.perf_counter()
+    offsets, fractions = sections.profile(array, 'z', 500, 1000.,
+                                          periodic=True)
+    print('sections={0}, time={1:.2f} s'.format(
+        len(offsets), time.perf_counter() - start))
+    print('area fraction={0:.4f}, volume fraction={1:.4f}'.format(
+        fractions.mean(), np.sum(np.pi / 6 * array[:, 3] ** 3) / 1000. ** 3))
+
+
+def bench_gmsh_geo(directory, n=100000):
+    """Запись сценария Gmsh (gmsh_geo.write_geo)."""
+
+    import gmsh_geo
+
+    array = random_particles(n, 1000., choice=(4., 6., 8.))
+    name = os.path.join(directory, 'model.geo')
+    start = time.perf_counter()
+    count = gmsh_geo.write_geo(name, array, matrix_edge=1000., var_ind=2)
+    print('inclusions={0}, {1:.1f} MB, time={2:.2f} s'.format(
+        count, os.path.getsize(name) / 2 ** 20, time.perf_counter() - start))
+
+
+def bench_voxels(directory, n=20000, resolution=512):
+    """Воксельное представление (voxels.voxelize) в файл .npy."""
+
+    import voxels
+
+    array = random_particles(n, 100., choice=(2., 4.))
+    name = os.path.join(directory, 'voxels.npy')
+    volume, report = voxels.voxelize(array, 100., resolution, file=name,
+                                     periodic=True)
+    del volume
+    print(report)
+
+
+def bench_tessellation(directory, n=1000000, level=0):
+    """
+    Триангуляция и запись STL/OBJ (tessellation.write); при n = 1e6
+    и level = 0 файл STL - около 1 ГБ.
+
+    """
+
+    import tessellation
+
+    array = random_particles(n, 1000., 5., 10.)
+    for name in ('particles.stl', 'particles.obj'):
+        path = os.path.join(directory, name)
+        start = time.perf_counter()
+        result = tessellation.write(path, array, level=level,
+                                    matrix_edge=1000.)
+        print(name, result,
+              '{0:.1f} MB'.format(os.path.getsize(path) / 2 ** 20),
+              'time={0:.2f} s'.format(time.perf_counter() - start))
+        os.remove(path)  # файлы велики - удаляются сразу
+
+
+def bench_visu(directory, n=100000):
+    """Построение изображения (visu.View3D, требуется matplotlib)."""
+
+    import shapes
+    import visu
+
+    many = shapes.ParticleSet.from_array(random_particles(n, 1000., 5., 10.))
+    start = time.perf_counter()
+    visu.View3D(1000., many, title='{0} частиц'.format(n))
+    print('time={0:.2f} s'.format(time.perf_counter() - start))
+
+
+BENCHMARKS = {
+    'audit': bench_audit,
+    'particle_files': bench_particle_files,
+    'sections': bench_sections,
+    'gmsh_geo': bench_gmsh_geo,
+    'voxels': bench_voxels,
+    'tessellation': bench_tessellation,
+    'visu': bench_visu,
+}
+
+
+def main(argv=None):
+    """Точка входа командной строки."""
+
+    parser = argparse.ArgumentParser(
+        description='Измерение производительности модулей')
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help='измерения: {0} (по умолчанию - все, кроме '
+                        'visu)'.format(', '.join(BENCHMARKS)))
+    parser.add_argument('-n', type=int, help='кол-во частиц')
+    args = parser.parse_args(argv)
+
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error('неизвестные измерения: {0}'.format(
+            ', '.join(sorted(unknown))))
+
+    names = args.names or [name for name in BENCHMARKS if name != 'visu']
+    extra = {} if args.n is None else {'n': args.n}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in names:
+            print('=== {0}'.format(name))
+            BENCHMARKS[name](directory, **extra)
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль пакетного расчёта распределений частиц из командной строки
+
+Запуск из каталога проекта: python -m microstructure config.json
+
+Файл параметров (JSON либо TOML) содержит ключи параметров расчёта
+(как в defaults.OPTIONS: matrix, gap, boundary_repulsion, max_iter,
+fractions_definition, regular_distribution, ...) и необязательный
+раздел run:
+    realizations - кол-во реализаций (больше 1 - ансамбль);
+    seed - зерно расчёта;
+    regular - регулярное распределение (lattice) вместо случайного;
+    load - файлы распределений частиц, загружаемые перед расчётом;
+    output - каталог результатов;
+    export - форматы экспорта: npz, tsv, stl, obj, geo, voxels;
+    level - детализация триангуляции (stl, obj);
+    resolution - кол-во вокселей по оси (voxels).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import audit
+import defaults
+import events
+import fill_deg
+import particle_files
+import placement
+
+RUN = {
+    'realizations': 1,
+    'seed': None,
+    'regular': False,
+    'load': [],
+    'output': 'results',
+    'export': ['npz'],
+    'level': 2,
+    'resolution': 256,
+}
+
+EXPORTS = ('npz', 'tsv', 'stl', 'obj', 'geo', 'voxels')
+
+
+def read_config(file):
+    """Прочитать файл параметров (.json либо .toml)."""
+
+    if file.lower().endswith('.toml'):
+        try:
+            import tomllib  # Python 3.11+
+        except ImportError:
+            try:
+                import tomli as tomllib  # Python < 3.11
+            except ImportError:
+                raise ValueError('для файлов TOML требуется Python 3.11+ '
+                                 'либо пакет tomli') from None
+        with open(file, 'rb') as f:
+            return tomllib.load(f)
+
+    with open(file, 'r') as f:
+        return json.load(f)
+
+
+def make_options(config):
+    """
+    Параметры расчёта и раздел run по содержимому файла параметров
+    (незаданные ключи - по умолчанию).
+
+    """
+
+    config = dict(config)
+    run = dict(RUN)
+    run.update(config.pop('run', {}))
+
+    unknown = (set(config) - set(defaults.OPTIONS)) | (set(run) - set(RUN))
+    if unknown:
+        raise ValueError('Неизвестные параметры: {0}'.format(
+            ', '.join(sorted(unknown))))
+
+    wrong = set(run['export']) - set(EXPORTS)
+    if wrong:
+        raise ValueError('Неизвестные форматы экспорта: {0}'.format(
+            ', '.join(sorted(wrong))))
+
+    return defaults.options(**config), run
+
+
+def filling_degree(options, particles):
+    """Степень заполнения матрицы по фракциям {d: KV}."""
+
+    dim = options['dim_ind'] + 2
+    matrix = placement.matrix(options)
+    spaces = fill_deg.fractions_spaces(
+        matrix, particles.points()[:, :dim], particles.d,
+        periodic=options['var_ind'] == 2)
+
+    return {d: fill_deg.filling(matrix, value) for d, value in spaces.items()}
+
+
+def export(options, particles, run, header, base=None):
+    """
+    Сохранить распределение в форматах run['export'] (base - имя файлов
+    без расширения, по умолчанию - по размерности задачи в каталоге
+    результатов); имена файлов.
+
+    """
+
+    if base is None:
+        base = os.path.join(run['output'],
+                            options['dim_tup'][options['dim_ind']])
+    dim = options['dim_ind'] + 2
+    files = {}
+
+    for kind in run['export']:
+        if kind in ('npz', 'tsv'):
+            files[kind] = base + '.' + kind
+            particle_files.save(files[kind], particles, header)
+        elif kind in ('stl', 'obj'):
+            import tessellation
+            files[kind] = base + '.' + kind
+            tessellation.write(files[kind], particles, dim, run['level'],
+                               options['matrix'])
+        elif kind == 'geo':
+            import gmsh_geo
+            files[kind] = base + '.geo'
+            gmsh_geo.write_geo(files[kind], particles, options['matrix'],
+                               dim, options['var_ind'])
+        elif kind == 'voxels':
+            import voxels
+            files[kind] = base + '_voxels.npy'
+            _, report = voxels.voxelize(
+                particles, options['matrix'], run['resolution'], dim,
+                file=files[kind], periodic=options['var_ind'] == 2)
+            header['voxel_filling'] = {
+                str(d): kv for d, kv in report.voxel.items()}
+
+    return files
+
+
+def run_config(config, listener=None):
+    """
+    Выполнить расчёт по параметрам config (словарь содержимого файла
+    параметров): загрузка, создание распределения, степень заполнения,
+    проверка, экспорт. Отчёт (словарь, с временем этапов timing)
+    сохраняется в файл report.json каталога результатов.
+
+    """
+
+    start = time.perf_counter()
+    timing = {}
+
+    options, run = make_options(config)
+    os.makedirs(run['output'], exist_ok=True)
+    entropy = np.random.SeedSequence(run['seed']).entropy
+    report = {'options': options, 'run': run, 'entropy': entropy}
+
+    stage = time.perf_counter()
+    loaded = None
+    if run['load']:
+        loaded, _, _ = particle_files.load(run['load'])
+        if loaded.dim == 3:
+            options['dim_ind'] = 1
+        report['loaded'] = len(loaded)
+    timing['load'] = time.perf_counter() - stage
+
+    if run['realizations'] > 1:  # ансамбль реализаций
+        import ensemble
+
+        # реализации сохраняются в .npz (либо .tsv, если задан только
+        # текстовый формат), остальные форматы - по сохранённым файлам
+        saved = 'tsv' if 'tsv' in run['export'] and \
+            'npz' not in run['export'] else 'npz'
+
+        stage = time.perf_counter()
+        results, summary = ensemble.run(
+            options, run['realizations'], seed=entropy, particles=loaded,
+            directory=run['output'], listener=listener,
+            extension='.' + saved)
+        timing['generate'] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        rest = dict(run, export=[kind for kind in run['export']
+                                 if kind != saved])
+        for result in results if rest['export'] else ():
+            particles, _, headers = particle_files.load(result['file'])
+            header = headers[0] or particle_files.metadata(
+                options, entropy=entropy, number=result['number'])
+            result['files'] = export(options, particles, rest, header,
+                                     os.path.splitext(result['file'])[0])
+            if 'voxel_filling' in header:
+                result['voxel_filling'] = header['voxel_filling']
+        timing['export'] = time.perf_counter() - stage
+
+        report['summary'] = summary
+        report['realizations'] = results
+    else:
+        stage = time.perf_counter()
+        if run['regular']:
+            import lattice
+            particles = lattice.generate(options, np.random.SeedSequence(
+                entropy))
+            if loaded is not None:
+                loaded.extend(particles)
+                particles = loaded
+            generated = None
+        else:
+            particles, generated = placement.generate(
+                options, loaded, listener=listener,
+                rng=np.random.SeedSequence(entropy))
+        timing['generate'] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        filling = filling_degree(options, particles)
+        timing['filling'] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        checked = audit.audit(options, particles)
+        timing['audit'] = time.perf_counter() - stage
+
+        report['particles'] = len(particles)
+        report['filling'] = {str(d): kv for d, kv in filling.items()}
+        report['total_filling'] = sum(filling.values())
+        report['audit'] = str(checked)
+        if generated is not None:
+            report['diameters'] = {
+                str(f): d for f, d in generated.diameters.items()}
+            report['added'] = {str(f): n for f, n in generated.added.items()}
+            report['fails'] = {str(f): n for f, n in generated.fails.items()}
+
+        stage = time.perf_counter()
+        header = particle_files.metadata(options, entropy=entropy)
+        report['files'] = export(options, particles, run, header)
+        if 'voxel_filling' in header:
+            report['voxel_filling'] = header['voxel_filling']
+        timing['export'] = time.perf_counter() - stage
+
+    timing['total'] = time.perf_counter() - start
+    report['timing'] = timing
+
+    with open(os.path.join(run['output'], 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    return report
+
+
+def main(argv=None):
+    """Точка входа командной строки; возвращает код завершения."""
+
+    parser = argparse.ArgumentParser(
+        prog='python -m microstructure',
+        description='Пакетный расчёт распределений частиц')
+    parser.add_argument('config', help='файл параметров (.json либо .toml)')
+    parser.add_argument('-o', '--output', help='каталог результатов')
+    parser.add_argument('-s', '--seed', type=int, help='зерно расчёта')
+    parser.add_argument('-n', '--realizations', type=int,
+                        help='кол-во реализаций')
+    parser.add_argument('-e', '--export', nargs='+', choices=EXPORTS,
+                        help='форматы экспорта')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='без вывода хода расчёта')
+    args = parser.parse_args(argv)
+
+    try:
+        config = read_config(args.config)
+        run = config.setdefault('run', {})
+        for key in ('output', 'seed', 'realizations', 'export'):
+            if getattr(args, key) is not None:
+                run[key] = getattr(args, key)
+
+        listener = None if args.quiet else \
+            events.PrintSink(level=events.WARNING, interval=5.)
+        report = run_config(config, listener)
+    except (OSError, ValueError) as error:
+        print('Ошибка: {0}'.format(error), file=sys.stderr)
+        return 1
+
+    if 'summary' in report:
+        print('Реализаций: {0}'.format(report['summary']['realizations']))
+    else:
+        print('Частиц: {0}, степень заполнения = {1:.4f}'.format(
+            report['particles'], report['total_filling']))
+        print(report['audit'])
+    print('Время: {0}'.format(', '.join(
+        '{0} = {1:.3f} с'.format(stage, elapsed)
+        for stage, elapsed in report['timing'].items())))
+
+    return 0
+
+
+if __name__ == '__main__':
+
+    sys.exit(main())
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль параметров расчёта по умолчанию
+"""
+
+import copy
+
+OPTIONS = {
+    'dim_tup': ('2D', '3D'),
+    'dim_ind': 1,
+    'var_tup': ('целиком', 'частично', 'периодически'),
+    'var_ind': 1,
+    'def_tup': ('количество частиц', 'степень заполнения',
+                'уплотнение до степени заполнения'),
+    'def_ind': 1,
+    'sampling_tup': ('равномерно', 'в свободном пространстве'),
+    'sampling_ind': 0,
+    'matrix': 100.,
+    'gap': 1.,
+    'boundary_repulsion': 20,
+    'max_iter': 1000,
+    'batch_size': 1,  # размер пакета кандидатов (1 - без пакетов)
+    'fractions_definition': [[50., 0.5], ],
+    'regular_distribution': [[0, 0, 0], [30, 30, 30], [3, 3, 3]],
+    'regular_distribution_diameter': 20.,
+    'lattice_tup': ('простая кубическая', 'объёмно-центрированная',
+                    'гранецентрированная',
+                    'гексагональная плотноупакованная'),
+    'lattice_ind': 0,
+    'jitter': 0.  # случайное смещение узлов (доля половины зазора)
+}
+
+
+def options(**changes):
+    """Копия параметров по умолчанию с изменениями changes."""
+
+    result = copy.deepcopy(OPTIONS)
+    result.update(changes)
+
+    return result
+
+
+if __name__ == '__main__':
+
+    print(options(matrix=200.))
@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль уплотнения частиц методом Любачевского-Стиллинджера
+"""
+
+import heapq
+import itertools
+import time
+import numpy as np
+import fill_deg
+import shapes
+import placement
+
+# виды событий
+COLLISION = 0  # соударение частиц
+WALL = 1  # соударение с границей матрицы
+TRANSFER = 2  # переход центра частицы в соседнюю ячейку
+
+EPS = 1e-9  # относительный запас скорости расхождения после соударения
+
+
+class Packing:
+    """
+    Событийная молекулярная динамика растущих частиц (алгоритм
+    Любачевского-Стиллинджера).
+
+    Подвижные частицы равномерно растут от s0 * D до целевого диаметра D,
+    соударяясь упруго друг с другом, с неподвижными (загруженными)
+    частицами и с границами матрицы (при периодических границах
+    частицы переходят через грани, расстояния определяются по
+    ближайшему образу). Соседи ищутся по ячейкам размера не меньше
+    наибольшего расстояния взаимодействия (диаметр + зазор).
+
+    """
+
+    def __init__(self, options, particles, mobile, diameters, s0,
+                 growth_rate, rng=None):
+        """
+        particles - начальное состояние (ParticleSet, диаметры подвижных
+        частиц уменьшены в s0 раз);
+        mobile - признаки подвижных (растущих) частиц;
+        diameters - целевые диаметры частиц;
+        growth_rate - скорость роста масштаба s (в единицу времени);
+        rng - генератор случайных чисел (начальные скорости).
+
+        """
+
+        self.dim = options['dim_ind'] + 2
+        self.edge = options['matrix']
+        self.gap = options['gap']
+        self.inside = options['var_ind'] == 0
+        # границы матрицы ограничивают поверхности (иначе - центры) частиц
+        self.periodic = options['var_ind'] == 2  # периодические границы
+
+        self.s0 = s0
+        self.growth_rate = growth_rate
+        self.t_end = (1 - s0) / growth_rate  # момент достижения s = 1
+        self.now = 0.
+
+        n = len(particles)
+        self.mobile = np.asarray(mobile, dtype=bool)
+        self.diameters = np.asarray(diameters, dtype=np.float64)
+
+        # состояние частиц: координаты в моменты t, скорости, моменты
+        # последнего обновления координат, радиусы в момент 0, скорости
+        # роста радиусов
+        dim = self.dim
+        self.state = np.zeros((n, 2 * dim + 3))
+        self.x = self.state[:, :dim]
+        self.v = self.state[:, dim:2 * dim]
+        self.t = self.state[:, 2 * dim]
+        self.r0 = self.state[:, 2 * dim + 1]
+        self.g = self.state[:, 2 * dim + 2]
+
+        self.x[:] = particles.points()
+        if self.periodic:
+            self.x[:] = np.mod(self.x, self.edge)
+        self.r0[:] = particles.d / 2
+        self.g[:] = np.where(self.mobile, self.diameters / 2 * growth_rate,
+                             0.)
+
+        # начальные скорости: нулевой суммарный импульс, среднеквадратичная
+        # скорость - средний целевой диаметр в единицу времени
+        self.speed = 1.
+        if np.any(self.mobile):
+            v = np.random.default_rng(rng).standard_normal((n, dim))
+            v -= v[self.mobile].mean(axis=0)
+            self.v[self.mobile] = v[self.mobile]
+            self.speed = self.diameters[self.mobile].mean()
+            self.rescale()
+
+        self.version = np.zeros(n, dtype=np.int64)  # номера траекторий
+        self.events = 0  # кол-во обработанных событий
+        self.queue = []
+        self.counter = itertools.count()
+
+        # ячейки
+        # размер ячейки - наибольшее расстояние взаимодействия
+        size = (np.max(self.diameters, initial=0.) + np.max(
+            self.diameters[self.mobile], initial=0.)) / 2 + self.gap
+        self.nc = max(1, int(self.edge // size)) if size > 0 else 1
+        self.cell = self.edge / self.nc
+        self.cells = {}
+        self.cell_of = []
+        for i in range(n):
+            key = self.key(self.x[i])
+            self.cell_of.append(key)
+            self.cells.setdefault(key, set()).add(i)
+        self._around = {}  # ячейка: соседние ячейки
+
+        for i in np.flatnonzero(self.mobile):
+            self.predict(i)
+
+    def __str__(self):
+        return 'packing: particles={0}, s={1:.4f}, events={2}'.format(
+            len(self.x), self.scale(), self.events)
+
+    def key(self, point):
+        """Индексы ячейки точки (с ограничением пределами матрицы)."""
+
+        if self.periodic:
+            return tuple(int(c // self.cell) % self.nc for c in point)
+
+        return tuple(min(max(int(c // self.cell), 0), self.nc - 1)
+                     for c in point)
+
+    def around(self, key):
+        """Ячейка и соседние с ней ячейки."""
+
+        if key not in self._around:
+            if self.periodic:
+                def wrap(k):
+                    return k % self.nc
+            else:
+                def wrap(k):
+                    return min(max(k, 0), self.nc - 1)
+
+            self._around[key] = {
+                tuple(wrap(k + o) for k, o in zip(key, offset))
+                for offset in itertools.product((-1, 0, 1), repeat=self.dim)}
+
+        return self._around[key]
+
+    def scale(self, t=None):
+        """Масштаб подвижных частиц (доля целевого диаметра)."""
+
+        return self.s0 + self.growth_rate * (self.now if t is None else t)
+
+    def rescale(self):
+        """Восстановить среднеквадратичную скорость подвижных частиц."""
+
+        v = self.v[self.mobile]
+        rms = np.sqrt(np.mean(np.einsum('ij,ij->i', v, v)))
+        if rms > 0:
+            self.v[self.mobile] *= self.speed / rms
+
+    def position(self, i, t):
+        """Координаты центра частицы i в момент t."""
+
+        return self.x[i] + self.v[i] * (t - self.t[i])
+
+    def advance(self, i, t):
+        """Перенести частицу i в момент t."""
+
+        self.x[i] = self.position(i, t)
+        self.t[i] = t
+
+    def displacement(self, delta):
+        """Векторы между центрами (по ближайшему образу при периодичности)."""
+
+        if self.periodic:
+            delta = delta - self.edge * np.round(delta / self.edge)
+
+        return delta
+
+    def push(self, t, i, kind, j=-1, data=0):
+        heapq.heappush(self.queue, (
+            t, next(self.counter), i, kind, j, data, int(self.version[i]),
+            int(self.version[j]) if j >= 0 else 0))
+
+    def predict(self, i):
+        """Запланировать ближайшее событие подвижной частицы i."""
+
+        now = self.now
+        dim = self.dim
+        row = self.state[i]
+        xi = row[:dim] + row[dim:2 * dim] * (now - row[2 * dim])
+        vi = row[dim:2 * dim]
+        ri = row[2 * dim + 1] + row[2 * dim + 2] * now
+        gi = row[2 * dim + 2]
+
+        best = np.inf
+        event = None
+
+        # соударения с соседями
+        neighbours = []
+        for key in self.around(self.cell_of[i]):
+            cell = self.cells.get(key)
+            if cell:
+                neighbours.extend(cell)
+        neighbours.remove(i)
+
+        if neighbours:
+            j = np.array(neighbours)
+            other = self.state[j]
+            dv = other[:, dim:2 * dim] - vi
+            dr = self.displacement(other[:, :dim] + other[:, dim:2 * dim] *
+                                   (now - other[:, 2 * dim])[:, None] - xi)
+            rho0 = other[:, 2 * dim + 1] + other[:, 2 * dim + 2] * now +\
+                (ri + self.gap)
+            rho1 = other[:, 2 * dim + 2] + gi
+
+            # |dr + dv t| = rho0 + rho1 t
+            a = np.einsum('ij,ij->i', dv, dv) - rho1 * rho1
+            b = np.einsum('ij,ij->i', dr, dv) - rho0 * rho1
+            c = np.einsum('ij,ij->i', dr, dr) - rho0 * rho0
+            disc = b * b - a * c
+
+            denominator = np.sqrt(np.maximum(disc, 0.)) - b
+            approach = ((b < 0) | (a < 0)) & (disc >= 0) & (denominator > 0)
+            dt = np.divide(c, denominator, out=np.full(len(j), np.inf),
+                           where=approach)
+
+            k = int(np.argmin(dt))
+            if dt[k] < best:
+                best = max(float(dt[k]), 0.)
+                event = COLLISION, neighbours[k], 0
+
+        # соударения с границами матрицы
+        xi = xi.tolist()
+        vi = vi.tolist()
+        if self.inside:
+            wall, growth = float(ri), float(gi)
+        else:
+            wall, growth = 0., 0.
+
+        for axis in range(0 if self.periodic else dim):
+            v = vi[axis]
+            if v - growth < 0:
+                dt = max((xi[axis] - wall) / (growth - v), 0.)
+                if dt < best:
+                    best = dt
+                    event = WALL, -1, 2 * axis
+            if v + growth > 0:
+                dt = max((self.edge - wall - xi[axis]) / (v + growth), 0.)
+                if dt < best:
+                    best = dt
+                    event = WALL, -1, 2 * axis + 1
+
+        # переход в соседнюю ячейку
+        key = self.cell_of[i]
+        for axis in range(dim):
+            v = vi[axis]
+            if v > 0 and (key[axis] < self.nc - 1 or self.periodic):
+                dt = max(((key[axis] + 1) * self.cell - xi[axis]) / v, 0.)
+            elif v < 0 and (key[axis] > 0 or self.periodic):
+                dt = max((key[axis] * self.cell - xi[axis]) / v, 0.)
+            else:
+                continue
+            if dt < best:
+                best = dt
+                event = TRANSFER, -1, 2 * axis + (v > 0)
+
+        if event is not None:
+            kind, j, data = event
+            self.push(now + best, i, kind, j, data)
+
+    def collide(self, i, j):
+        """Соударение частиц i и j в текущий момент."""
+
+        self.advance(i, self.now)
+        self.advance(j, self.now)
+
+        normal = self.displacement(self.x[j] - self.x[i])
+        normal /= np.linalg.norm(normal)
+        rho1 = self.g[i] + self.g[j]
+        need = rho1 * (1 + EPS) + EPS * self.speed
+        # скорость расхождения не меньше скорости роста зазора
+
+        ui = self.v[i] @ normal
+        uj = self.v[j] @ normal
+
+        if self.mobile[j]:
+            # обмен нормальными составляющими скоростей
+            self.v[i] += (uj - ui) * normal
+            self.v[j] += (ui - uj) * normal
+            separation = ui - uj
+            if separation < need:
+                self.v[i] -= (need - separation) / 2 * normal
+                self.v[j] += (need - separation) / 2 * normal
+        else:
+            # отражение от неподвижной частицы
+            self.v[i] -= (ui + max(-ui, need)) * normal
+
+        self.version[i] += 1
+        self.version[j] += 1
+
+        self.predict(i)
+        if self.mobile[j]:
+            self.predict(j)
+
+    def bounce(self, i, data):
+        """Соударение частицы i с границей матрицы в текущий момент."""
+
+        self.advance(i, self.now)
+
+        axis, upper = divmod(data, 2)
+        need = (self.g[i] if self.inside else 0.) * (1 + EPS) +\
+            EPS * self.speed
+        v = self.v[i, axis]
+
+        if upper:
+            self.v[i, axis] = min(-v, -need)
+        else:
+            self.v[i, axis] = max(-v, need)
+
+        self.version[i] += 1
+        self.predict(i)
+
+    def transfer(self, i, data):
+        """Переход центра частицы i в соседнюю ячейку."""
+
+        axis, forward = divmod(data, 2)
+        key = list(self.cell_of[i])
+        key[axis] += 1 if forward else -1
+
+        if self.periodic and not 0 <= key[axis] < self.nc:
+            # переход через грань матрицы
+            key[axis] %= self.nc
+            self.advance(i, self.now)
+            self.x[i, axis] += -self.edge if forward else self.edge
+
+        key = tuple(key)
+
+        self.cells[self.cell_of[i]].discard(i)
+        self.cells.setdefault(key, set()).add(i)
+        self.cell_of[i] = key
+
+        self.predict(i)
+
+    def thermostat(self):
+        """Перенормировать скорости всех подвижных частиц."""
+
+        for i in np.flatnonzero(self.mobile):
+            self.advance(i, self.now)
+        self.rescale()
+        self.version[self.mobile] += 1
+        for i in np.flatnonzero(self.mobile):
+            self.predict(i)
+
+    def run(self, max_events, stop, progress=None, interval=1000,
+            tolerance=1e-4):
+        """
+        Обработать события до достижения целевого размера частиц,
+        заклинивания упаковки (за период перенормировки скоростей масштаб
+        вырос меньше чем на tolerance), исчерпания max_events либо
+        остановки (stop). Возвращает достигнутый масштаб s.
+
+        """
+
+        mobile = int(np.count_nonzero(self.mobile))
+        rescale_every = 10 * max(mobile, 1)  # период перенормировки
+        last = self.scale()
+
+        while self.queue and self.events < max_events:
+            t, _, i, kind, j, data, vi, vj = heapq.heappop(self.queue)
+
+            if self.version[i] != vi:
+                continue  # устаревшее событие
+
+            if t > self.t_end:
+                self.now = self.t_end
+                break
+
+            self.now = t
+
+            if kind == COLLISION and self.version[j] != vj:
+                self.predict(i)  # траектория партнёра изменилась
+                continue
+
+            self.events += 1
+
+            if kind == COLLISION:
+                self.collide(i, j)
+            elif kind == WALL:
+                self.bounce(i, data)
+            else:
+                self.transfer(i, data)
+
+            if self.events % rescale_every == 0:
+                if self.scale() - last < tolerance * last:
+                    break  # упаковка заклинена
+                last = self.scale()
+                self.thermostat()
+
+            if self.events % interval == 0:
+                if stop():
+                    break
+                if progress is not None:
+                    progress(self)
+        else:
+            if not self.queue:
+                self.now = self.t_end
+
+        for i in range(len(self.x)):
+            self.advance(i, self.now)
+
+        return self.scale()
+
+    def particles(self, fraction):
+        """Набор частиц текущего состояния (ParticleSet)."""
+
+        d = np.where(self.mobile, self.diameters * self.scale(),
+                     2 * self.r0)
+
+        result = shapes.ParticleSet(dim=self.dim, capacity=len(d))
+        array = np.zeros((len(d), 4))
+        array[:, :self.dim] = self.x
+        array[:, 3] = d
+        result.extend(array)
+        result.fraction[:] = fraction
+
+        return result
+
+
+def particle_space(dim, diameter):
+    """Площадь круга либо объём шара."""
+
+    if dim == 2:
+        return np.pi * diameter ** 2 / 4
+
+    return np.pi * diameter ** 3 / 6
+
+
+def generate(options, particles=None, listener=None, stop=None, rng=None,
+             growth_rate=0.05, initial_filling=0.25):
+    """
+    Создать плотную упаковку частиц фракций методом
+    Любачевского-Стиллинджера.
+
+    options['fractions_definition'] - (диаметр, степень заполнения):
+    кол-во частиц фракции определяется по целевой степени заполнения.
+    Частицы размещаются случайно (placement.generate) в уменьшенном
+    масштабе s0 (начальная степень заполнения initial_filling) и затем
+    растут до целевого диаметра. Имеющиеся частицы particles (независимо
+    от их номеров фракций) неподвижны и не учитываются в отчёте.
+    Проверки граничного отталкивания в ходе роста не выполняются.
+    rng - генератор случайных чисел либо зерно (как в placement.generate).
+
+    Возвращает набор всех частиц ParticleSet и отчёт placement.Report.
+
+    """
+
+    start = time.perf_counter()
+
+    rng = np.random.default_rng(rng)
+
+    notify = listener or placement.silent
+    stop = stop or placement.never_stop
+    dim = options['dim_ind'] + 2
+    volume = options['matrix'] ** dim
+
+    if particles is None:
+        particles = shapes.ParticleSet(dim=dim)
+    elif not isinstance(particles, shapes.ParticleSet):
+        particles = shapes.ParticleSet.from_array(particles, dim=dim)
+
+    counts = []
+    target = 0.
+    for diameter, filling in options['fractions_definition']:
+        count = 0
+        if diameter != 0:
+            count = int(round(filling * volume /
+                              particle_space(dim, diameter)))
+            target += count * particle_space(dim, diameter) / volume
+        counts.append(count)
+
+    # масштаб s0: начальная степень заполнения области случайного выбора
+    # центров (см. placement.random_centres) равна initial_filling
+    largest = max((d for d, _ in options['fractions_definition']),
+                  default=0.)
+    s0 = 1.
+    for _ in range(20):
+        if not target:
+            break
+        region = options['matrix']
+        if options['var_ind'] == 0:
+            region -= 4 * largest * s0
+        if region <= 0:
+            s0 /= 2
+            continue
+        s0 = min((initial_filling / target) ** (1 / dim) *
+                 region / options['matrix'], 1.)
+
+    # начальное случайное размещение уменьшенных частиц
+    while True:
+        initial = dict(options, def_ind=0, fractions_definition=[
+            [diameter * s0, count] for (diameter, _), count in zip(
+                options['fractions_definition'], counts)])
+        state, report = placement.generate(
+            initial, particles, stop=stop, rng=rng)
+        if not report.fails or report.stopped or s0 < 1e-3:
+            break
+        s0 /= 2
+
+    # подвижны только добавленные частицы (имеющиеся частицы, в том
+    # числе с номерами фракций прежних расчётов, неподвижны)
+    mobile = np.arange(len(state)) >= len(particles)
+    diameters = state.d.copy()
+    definition = np.array([d for d, _ in options['fractions_definition']],
+                          dtype=np.float64)
+    diameters[mobile] = definition[state.fraction[mobile]]
+
+    packing = Packing(options, state, mobile, diameters, s0, growth_rate,
+                      rng)
+
+    def progress(p):
+        notify('batch', diameter=np.max(diameters, initial=0.),
+               centres=np.empty((0, dim)), iteration=p.events,
+               filling=np.sum(particle_space(
+                   dim, diameters[mobile] * p.scale())) / volume)
+
+    scale = packing.run(
+        max_events=options['max_iter'] * max(len(state), 1), stop=stop,
+        progress=progress)
+
+    result = packing.particles(state.fraction)
+
+    report = placement.Report()
+    report.initial = len(particles)
+    report.attempts = packing.events
+    report.stopped = stop()
+
+    # отчёт - только по добавленным частицам
+    occupied = fill_deg.spaces(
+        placement.matrix(options), result.points()[mobile], result.d[mobile],
+        periodic=options['var_ind'] == 2)
+    added = result.fraction[mobile]
+
+    for fraction, (diameter, _) in enumerate(
+            options['fractions_definition']):
+        if diameter == 0:
+            continue
+        members = added == fraction
+        report.diameters[fraction] = diameter
+        report.added[fraction] = int(np.count_nonzero(members))
+        report.filling[fraction] = float(np.sum(occupied[members])) / volume
+        if scale < 1 and np.any(members):
+            # целевой размер частиц не достигнут
+            report.fails[fraction] = report.added[fraction]
+            notify('failed', diameter=diameter)
+
+    report.elapsed = time.perf_counter() - start
+
+    return result, report
+
+
+if __name__ == '__main__':
+
+    opt = {
+        'dim_ind': 1,
+        'var_ind': 0,
+        'def_ind': 2,
+        'matrix': 100.,
+        'gap': 0.5,
+        'boundary_repulsion': 0,
+        'max_iter': 1000,
+        'batch_size': 256,
+        'sampling_ind': 0,
+        'fractions_definition': [[10., 0.45]],
+    }
+
+    ps, rep = generate(opt)
+    print(ps)
+    print(rep)
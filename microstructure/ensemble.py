@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль расчёта ансамбля независимых реализаций распределения частиц
+"""
+
+import concurrent.futures
+import json
+import os
+import time
+import numpy as np
+import particle_files
+import placement
+
+
+def seed_sequence(entropy, number):
+    """
+    Зерно реализации number ансамбля с общим зерном entropy
+    (совпадает с np.random.SeedSequence(entropy).spawn(...)[number]).
+
+    """
+
+    return np.random.SeedSequence(entropy, spawn_key=(number,))
+
+
+def file_name(options, number, extension='.npz'):
+    """Имя файла распределения частиц реализации number."""
+
+    return '{0}_{1:04d}{2}'.format(
+        options['dim_tup'][options['dim_ind']], number, extension)
+
+
+def realization(options, entropy, number, particles=None, directory=None,
+                extension='.npz'):
+    """
+    Рассчитать реализацию number ансамбля с общим зерном entropy.
+
+    Реализация точно воспроизводится по (entropy, number). При заданном
+    каталоге directory распределение сохраняется в файл (.npz - с
+    параметрами расчёта и зерном в заголовке, .tsv - текст x, y, z, d).
+    Возвращает сводку о реализации (словарь).
+
+    """
+
+    result, report = placement.generate(
+        options, particles, rng=seed_sequence(entropy, number))
+
+    file = None
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+        file = os.path.join(directory, file_name(options, number, extension))
+        particle_files.save(file, result, particle_files.metadata(
+            options, entropy=entropy, number=number))
+
+    return {
+        'number': number,
+        'entropy': entropy,
+        'file': file,
+        'particles': len(result),
+        'diameters': {str(f): d for f, d in report.diameters.items()},
+        'added': {str(f): n for f, n in report.added.items()},
+        'fails': {str(f): n for f, n in report.fails.items()},
+        'filling': {str(f): kv for f, kv in report.filling.items()},
+        'attempts': report.attempts,
+        'stopped': report.stopped,
+        'elapsed': report.elapsed,
+    }
+
+
+def statistics(results):
+    """Сводная статистика ансамбля по сводкам реализаций."""
+
+    def describe(values):
+        values = np.asarray(values, dtype=np.float64)
+        return {
+            'mean': float(values.mean()),
+            'std': float(values.std(ddof=1)) if len(values) > 1 else 0.,
+            'min': float(values.min()),
+            'max': float(values.max()),
+        }
+
+    if not results:
+        return {'realizations': 0}
+
+    fractions = sorted({f for r in results for f in r['filling']}, key=int)
+
+    return {
+        'realizations': len(results),
+        'failed': sum(1 for r in results if r['fails']),
+        'particles': describe([r['particles'] for r in results]),
+        'filling': {
+            f: describe([r['filling'].get(f, 0.) for r in results])
+            for f in fractions},
+        'total_filling': describe(
+            [sum(r['filling'].values()) for r in results]),
+        'elapsed': describe([r['elapsed'] for r in results]),
+    }
+
+
+def run(options, realizations, seed=None, particles=None, directory=None,
+        processes=None, listener=None, stop=None, extension='.npz'):
+    """
+    Рассчитать ансамбль из realizations реализаций в пуле процессов.
+
+    Реализация k получает собственный поток случайных чисел
+    seed_sequence(entropy, k), где entropy - общее зерно ансамбля
+    (seed либо случайное). Файлы реализаций (формата extension) и сводка
+    ensemble.json сохраняются в каталоге directory (если задан).
+    listener - обработчик событий listener(event, **info), вызывается
+    по завершении каждой реализации ('realization'); stop - признак
+    остановки (нерассчитанные реализации отменяются).
+
+    Возвращает список сводок реализаций и сводную статистику.
+
+    """
+
+    start = time.perf_counter()
+
+    entropy = np.random.SeedSequence(seed).entropy
+    notify = listener or placement.silent
+    stop = stop or placement.never_stop
+
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+        futures = [pool.submit(realization, options, entropy, number,
+                               particles, directory, extension)
+                   for number in range(realizations)]
+
+        for future in concurrent.futures.as_completed(futures):
+            if future.cancelled():
+                continue
+            results.append(future.result())
+            notify('realization', **results[-1])
+
+            if stop():
+                for other in futures:
+                    other.cancel()
+
+    results.sort(key=lambda r: r['number'])
+    summary = statistics(results)
+    summary['entropy'] = entropy
+    summary['elapsed_total'] = time.perf_counter() - start
+
+    if directory is not None:
+        with open(os.path.join(directory, 'ensemble.json'), 'w') as file:
+            json.dump({'options': options, 'summary': summary,
+                       'realizations': results}, file, indent=2,
+                      ensure_ascii=False)
+
+    return results, summary
+
+
+if __name__ == '__main__':
+
+    opt = {
+        'dim_tup': ('2D', '3D'),
+        'dim_ind': 1,
+        'var_ind': 1,
+        'def_ind': 1,
+        'matrix': 100.,
+        'gap': 1.,
+        'boundary_repulsion': 20,
+        'max_iter': 1000,
+        'batch_size': 256,
+        'sampling_ind': 0,
+        'fractions_definition': [[20., 0.2], [10., 0.1]],
+    }
+
+    res, summ = run(opt, 8, seed=2020)
+    print(json.dumps(summ, indent=2))
+
+    again = realization(opt, summ['entropy'], 3)
+    print('reproduced:', again['filling'] == res[3]['filling'] and
+          again['particles'] == res[3]['particles'])
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль приёма событий расчёта (уровни, счётчики, ограничение частоты)
+"""
+
+import collections
+import time
+
+# уровни событий
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+# уровни событий модуля placement
+EVENT_LEVELS = {
+    'batch': DEBUG,  # очередной пакет кандидатов
+    'added': DEBUG,  # частица добавлена
+    'overlap': DEBUG,  # кандидат пересекается с частицей
+    'failed': WARNING,  # не удалось разместить частицу
+    'realization': INFO,  # рассчитана реализация ансамбля (модуль ensemble)
+}
+
+
+class Console:
+    """Текстовая консоль с ограниченным кол-вом строк (кольцевой буфер)."""
+
+    def __init__(self, maxlen=1000):
+        self.maxlen = maxlen
+        self.buffer = collections.deque(maxlen=maxlen)
+        self.dropped = 0  # кол-во вытесненных строк
+
+    def __str__(self):
+        return 'console: lines={0}, maxlen={1}, dropped={2}'.format(
+            len(self.buffer), self.maxlen, self.dropped)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def append(self, text):
+        """Добавить строку (старейшая строка вытесняется)."""
+
+        if len(self.buffer) == self.maxlen:
+            self.dropped += 1
+        self.buffer.append(text)
+
+    def clear(self):
+        """Очистить консоль."""
+
+        self.buffer.clear()
+        self.dropped = 0
+
+    def lines(self):
+        """Строки консоли от старых к новым."""
+
+        return list(self.buffer)
+
+
+class EventSink:
+    """
+    Приёмник событий расчёта.
+
+    Экземпляр вызывается как обработчик событий placement.generate:
+    sink(event, **info). Каждое событие учитывается в счётчиках, в вывод
+    передаются только события не ниже заданного уровня. Сводка о ходе
+    расчёта (progress) выдаётся не чаще одного раза за interval секунд.
+
+    """
+
+    def __init__(self, level=INFO, interval=0.25, clock=time.monotonic):
+        self.level = level
+        self.interval = interval  # минимальный интервал сводок, с
+        self.clock = clock
+        self.counters = collections.Counter()  # событие: кол-во
+        self.last = None  # время последней сводки
+        self.info = {}  # сведения последнего события 'batch'
+
+    def __call__(self, event, **info):
+        self.counters[event] += 1
+
+        if EVENT_LEVELS.get(event, INFO) >= self.level:
+            self.write(event, info)
+
+        if event == 'batch':
+            self.info = info
+            now = self.clock()
+            if self.last is None or now - self.last >= self.interval:
+                self.last = now
+                self.progress(info)
+
+    def write(self, event, info):
+        """Вывести событие (переопределяется в наследниках)."""
+
+    def progress(self, info):
+        """Вывести сводку о ходе расчёта (переопределяется в наследниках)."""
+
+    def flush(self):
+        """Вывести итоговую сводку."""
+
+        if self.info:
+            self.progress(self.info)
+
+    def reset(self):
+        """Сбросить счётчики перед новым расчётом."""
+
+        self.counters.clear()
+        self.last = None
+        self.info = {}
+
+
+class PrintSink(EventSink):
+    """Приёмник событий с выводом в стандартный поток."""
+
+    def write(self, event, info):
+        print('{0}: {1}'.format(event, info))
+
+    def progress(self, info):
+        print('progress: {0}'.format(dict(self.counters)))
+
+
+if __name__ == '__main__':
+
+    sink = PrintSink(level=WARNING, interval=0.1)
+    for i in range(100000):
+        sink('batch', iteration=i)
+        sink('overlap')
+    sink('failed', diameter=10.)
+    sink.flush()
+
+    console = Console(maxlen=3)
+    for i in range(5):
+        console.append('line {0}'.format(i))
+    print(console, console.lines())
@@ -5,81 +5,177 @@
 Модуль определения степени заполнения матрицы частицами наполнителя (3D)
 """
 
+import itertools
 import numpy as np
 
 
-def _location(matrix, particle):
-    """Определение места расположения частицы относительно матрицы."""
+def _arcsin(x):
+    return np.arcsin(np.clip(x, -1., 1.))
 
-    loc = [None, None]
 
-    try:
-        if particle.d > matrix.edge:
-            raise RuntimeError("Диаметр частицы превышает размер матрицы!")
+def _ratio(x, y):
+    """x / y (0 при y = 0)."""
 
-        if particle.x + particle.d / 2 > matrix.edge:
-            loc[0] = 1
-        elif particle.x - particle.d / 2 < 0:
-            loc[0] = -1
-        else:
-            loc[0] = 0
+    x, y = np.broadcast_arrays(x, y)
+    return np.divide(x, y, out=np.zeros(x.shape), where=y > 0)
 
-        if particle.y + particle.d / 2 > matrix.edge:
-            loc[1] = 1
-        elif particle.y - particle.d / 2 < 0:
-            loc[1] = -1
-        else:
-            loc[1] = 0
 
-        if 'z' in particle.__dict__:
-            loc = loc + [None]
-            if particle.z + particle.d / 2 > matrix.edge:
-                loc[2] = 1
-            elif particle.z - particle.d / 2 < 0:
-                loc[2] = -1
-            else:
-                loc[2] = 0
+def _segment(a, r):
+    """Площадь части круга радиуса r за хордой на расстоянии a от центра."""
 
-        return loc
+    return r * r * np.arccos(np.clip(a / r, -1., 1.)) -\
+        a * np.sqrt(np.maximum(r * r - a * a, 0.))
 
-    except RuntimeError as error:
-        print(error)
 
+def _cap(a, r):
+    """Объём части шара радиуса r за плоскостью на расстоянии a."""
 
-def space(matrix, particle):
-    """Определение площади либо объёма частицы."""
+    return np.pi * (r - a) ** 2 * (2 * r + a) / 3
+
+
+def _corner(a, b, r):
+    """Площадь части круга {x > a, y > b} (a, b >= 0)."""
+
+    value = 0.5 * r * r * (np.pi / 2 - _arcsin(a / r) - _arcsin(b / r)) -\
+        0.5 * b * np.sqrt(np.maximum(r * r - b * b, 0.)) -\
+        0.5 * a * np.sqrt(np.maximum(r * r - a * a, 0.)) + a * b
+
+    return np.where(a * a + b * b < r * r, value, 0.)
+
+
+def _octant_primitive(z, a, b, r):
+    """Первообразная по z площади сечения {x > a, y > b} шара радиуса r."""
+
+    rho = np.sqrt(np.maximum(r * r - z * z, 0.))  # радиус сечения
+
+    def arcsin_part(a):
+        # первообразная rho^2 * arcsin(a / rho)
+        s2 = r * r - a * a
+        root = np.sqrt(np.maximum(s2 - z * z, 0.))
+        angle = _arcsin(_ratio(z, np.sqrt(s2)))
+        return (r * r * z - z ** 3 / 3) * _arcsin(_ratio(a, rho)) -\
+            a * ((s2 * angle - z * root) / 6 - 2 * r * r / 3 * angle) -\
+            2 * r ** 3 / 3 * np.arctan2(a * z, r * root)
+
+    def root_part(a):
+        # первообразная sqrt(rho^2 - a^2)
+        s2 = r * r - a * a
+        return 0.5 * (z * np.sqrt(np.maximum(s2 - z * z, 0.)) +
+                      s2 * _arcsin(_ratio(z, np.sqrt(s2))))
+
+    return np.pi / 4 * (r * r * z - z ** 3 / 3) -\
+        0.5 * arcsin_part(a) - 0.5 * arcsin_part(b) -\
+        0.5 * b * root_part(b) - 0.5 * a * root_part(a) + a * b * z
+
+
+def _octant(a, b, c, r):
+    """Объём части шара {x > a, y > b, z > c} (a, b, c >= 0)."""
+
+    h2 = r * r - a * a - b * b
+    h = np.sqrt(np.maximum(h2, 0.))
+    c = np.minimum(c, h)
+
+    return np.where(h2 > c * c, _octant_primitive(h, a, b, r) -
+                    _octant_primitive(c, a, b, r), 0.)
+
+
+def _measure(axes, e, r):
+    """
+    Площадь либо объём части частиц {x_k > e_k для осей axes}
+    (координаты относительно центров, e >= 0).
+
+    """
+
+    dim = e.shape[1]
 
-    loc = _location(matrix=matrix, particle=particle)
+    if len(axes) == 0:
+        if dim == 3:
+            return 4 / 3 * np.pi * r ** 3
+        return np.pi * r ** 2
 
-    height = 0
+    if len(axes) == 1:
+        if dim == 3:
+            return _cap(e[:, axes[0]], r)
+        return _segment(e[:, axes[0]], r)
 
-    if loc[0] == 1:
-        height = particle.x + particle.d / 2 - matrix.edge
-    elif loc[0] == -1:
-        height = abs(particle.x - particle.d / 2)
+    if len(axes) == 2:
+        if dim == 3:
+            return 2 * _octant(e[:, axes[0]], e[:, axes[1]], 0., r)
+        return _corner(e[:, axes[0]], e[:, axes[1]], r)
 
-    if loc[1] == 1:
-        height = particle.y + particle.d / 2 - matrix.edge
-    elif loc[1] == -1:
-        height = abs(particle.y - particle.d / 2)
+    return _octant(e[:, 0], e[:, 1], e[:, 2], r)
 
-    if 'z' in particle.__dict__:
-        if loc[2] == 1:
-            height = particle.z + particle.d / 2 - matrix.edge
-        elif loc[2] == -1:
-            height = abs(particle.z - particle.d / 2)
 
-    if 'z' in particle.__dict__:
-        value = 4 / 3 * np.pi * (particle.d / 2) ** 3 -\
-            np.pi * height ** 2 * (particle.d / 2 - height / 3)
-    else:
-        alpha = 2 * np.arccos(1 - height / (particle.d / 2))
-        value = np.pi * (particle.d / 2) ** 2 -\
-            0.5 * (particle.d / 2) ** 2 * (alpha - np.sin(alpha))
+def spaces(matrix, points, diameters, periodic=False):
+    """
+    Площади либо объёмы частей частиц внутри матрицы; частицы заданы
+    массивами центров (n x dim) и диаметров.
+
+    Точный расчёт для частиц, пересекающих до двух (2D) либо трёх (3D)
+    граней матрицы: формула включений-исключений по граням, ближайшим
+    к центру по каждой оси (диаметр не превышает размер матрицы).
+    При периодических границах (periodic) части частицы за гранями
+    возвращаются в матрицу у противоположных граней - частица
+    учитывается целиком.
+
+    """
+
+    points = np.asarray(points, dtype=np.float64)
+    d = np.asarray(diameters, dtype=np.float64)
+    r = d / 2
+    dim = points.shape[1]
+
+    if np.any(d > matrix.edge):
+        raise ValueError('Диаметр частицы превышает размер матрицы!')
+
+    if periodic:
+        return _measure([], np.empty((len(r), dim)), r)
+
+    # расстояние от центра до ближайшей грани по каждой оси
+    # (отрицательное - центр вне матрицы)
+    distance = np.minimum(points, matrix.edge - points)
+    e = np.minimum(np.abs(distance), r[:, None])
+    outside = distance < 0
+
+    # часть внутри = П(1 - I(x_k > e_k)) по осям с центром внутри
+    # x П I(x_k > e_k) по осям с центром снаружи (отражение)
+    value = np.zeros_like(r)
+    for subset in itertools.product((False, True), repeat=dim):
+        coefficient = np.ones_like(r)
+        for axis in range(dim):
+            if subset[axis]:
+                coefficient *= np.where(outside[:, axis], 1., -1.)
+            else:
+                coefficient *= np.where(outside[:, axis], 0., 1.)
+        if not np.any(coefficient):
+            continue
+        axes = [axis for axis in range(dim) if subset[axis]]
+        value += coefficient * _measure(axes, e, r)
 
     return value
 
 
+def space(matrix, particle):
+    """Определение площади либо объёма частицы."""
+
+    point = [particle.x, particle.y]
+    if particle.dim == 3:
+        point.append(particle.z)
+
+    return float(spaces(matrix, [point], [particle.d])[0])
+
+
+def fractions_spaces(matrix, points, diameters, periodic=False):
+    """Суммарные площади либо объёмы частиц по диаметрам {d: value}."""
+
+    unique, inverse = np.unique(diameters, return_inverse=True)
+    totals = np.bincount(inverse.ravel(),
+                         weights=spaces(matrix, points, diameters, periodic),
+                         minlength=len(unique))
+
+    return dict(zip(unique.tolist(), totals.tolist()))
+
+
 def filling(matrix, space_):
     """Степень заполнения матрицы частицами."""
 
@@ -105,3 +201,11 @@ if __name__ == '__main__':
     print(sphere)
     print('V={0:.3f}'.format(space(cube, sphere)))
     print('KV={0:.3f}'.format(filling(cube, space(cube, sphere))))
+
+    print('-'*50)
+
+    cube = shapes.CubeMatrix(edge=100.)
+    centres = np.random.random_sample((1000000, 3)) * cube.edge
+    diameters = np.full(len(centres), 1.)
+    print('KV={0:.3f}, 10^6 частиц'.format(filling(
+        cube, spaces(cube, centres, diameters).sum())))
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль карты свободного пространства для центров частиц
+"""
+
+import itertools
+import numpy as np
+
+
+class FreeSpace:
+    """
+    Адаптивная воксельная карта допустимых положений центров частиц
+    одного диаметра.
+
+    Воксель исключается, если он целиком лежит в зоне исключения
+    какой-либо частицы (шар радиуса d/2 + d_j/2 + gap) либо целиком
+    в запрещённой проверками границ области. Кандидаты выбираются
+    равномерно внутри оставшихся вокселей, поэтому доля принятых
+    кандидатов не падает до нуля вблизи насыщения.
+
+    При низкой доле принятых кандидатов карта измельчается вдвое:
+    сначала как плотный массив (до max_voxels вокселей), затем как
+    разреженный список оставшихся свободных вокселей (октодерево).
+
+    """
+
+    def __init__(self, options, diameter, index, max_voxels=2 ** 24,
+                 window=256, threshold=0.05, rng=None):
+        self.options = options
+        self.diameter = diameter
+        self.index = index  # пространственный индекс частиц (UniformGrid)
+        self.dim = options['dim_ind'] + 2
+        self.max_voxels = max_voxels
+        self.window = window  # кол-во попыток для оценки доли принятых
+        self.threshold = threshold  # доля принятых для измельчения карты
+        self.rng = np.random.default_rng(rng)  # генератор случайных чисел
+
+        if options['var_ind'] == 0:
+            # частицы целиком находятся в матрице
+            # (как в shapes.Point2D.randomize_particles_inside)
+            self.lower = 2 * diameter
+            self.upper = options['matrix'] - 2 * diameter
+        else:
+            # центры частиц находятся в матрице (либо границы периодичны)
+            self.lower = 0.
+            self.upper = options['matrix']
+
+        self.periodic = options['var_ind'] == 2  # периодические границы
+
+        length = self.upper - self.lower
+        if length <= 0:
+            raise ValueError('Диаметр частицы превышает размер матрицы!')
+
+        self.n = int(np.ceil(length / (diameter / 2)))  # вокселей по оси
+        while self.n > 1 and self.n ** self.dim > max_voxels // 8:
+            self.n //= 2
+
+        # смещения дочерних вокселей при измельчении
+        self.children = np.array(
+            list(itertools.product((0, 1), repeat=self.dim)))
+
+        self.free = None  # плотная карта (массив признаков)
+        self.voxels = None  # разреженная карта (индексы свободных вокселей)
+        self._indices = None  # свободные воксели плотной карты
+
+        self.attempts = 0  # попыток в текущем окне
+        self.accepted = 0  # принятых кандидатов в текущем окне
+
+        self.build()
+
+    def __str__(self):
+        return 'free space: d={0:.3f}, voxel={1:.4g}, free={2}'.format(
+            self.diameter, self.h, self.count())
+
+    @property
+    def h(self):
+        """Размер вокселя."""
+
+        return (self.upper - self.lower) / self.n
+
+    def _forbidden(self, low):
+        """
+        Признаки вокселей с нижними границами low, целиком запрещённых
+        проверкой граничного отталкивания (по отдельным осям).
+
+        """
+
+        if self.periodic:
+            return np.zeros(np.shape(low), dtype=bool)
+
+        edge = self.options['matrix']
+        radius = self.diameter / 2
+        repulsion = self.options['boundary_repulsion'] / 100 * radius
+        high = low + self.h
+
+        # полосы граничного отталкивания: cross < distance < gap
+        band = ((low > radius - repulsion) & (high < radius + repulsion) &
+                (high <= edge / 2)) |\
+            ((edge - high > radius - repulsion) &
+             (edge - low < radius + repulsion) & (low >= edge / 2))
+
+        return band
+
+    def build(self):
+        """Построить плотную карту на текущем уровне измельчения."""
+
+        band = self._forbidden(self.lower + self.h * np.arange(self.n))
+
+        forbidden = np.zeros((self.n,) * self.dim, dtype=bool)
+        for axis in range(self.dim):
+            shape = [1] * self.dim
+            shape[axis] = self.n
+            forbidden |= band.reshape(shape)
+
+        self.free = ~forbidden
+
+        size = len(self.index)
+        for point, d in zip(self.index.points[:size],
+                            self.index.diameters[:size]):
+            self.mark(point, d)
+        self._indices = None
+
+    def mark(self, point, d):
+        """
+        Исключить воксели, целиком закрытые частицей (point, d); при
+        периодических границах - и её образами.
+
+        """
+
+        radius = self.diameter / 2 + d / 2 + self.options['gap']
+        h = self.h
+
+        if self.voxels is not None:
+            low = self.index.displacement(
+                self.lower + self.voxels * h + h / 2 - point) - h / 2
+            far = np.maximum(np.abs(low), np.abs(low + h))
+            # наибольшее удаление точек вокселя от центра по осям
+            covered = np.einsum('ij,ij->i', far, far) <= radius * radius
+            self.voxels = self.voxels[~covered]
+            return
+
+        if self.periodic:
+            edge = self.options['matrix']
+            for shift in itertools.product((-edge, 0., edge),
+                                           repeat=self.dim):
+                self._mark_box(np.mod(point, edge) + shift, radius)
+        else:
+            self._mark_box(point, radius)
+
+    def _mark_box(self, point, radius):
+        """Исключить воксели плотной карты, закрытые шаром (point, radius)."""
+
+        h = self.h
+        box = []
+        distances = []
+        for axis in range(self.dim):
+            first = max(int((point[axis] - radius - self.lower) // h), 0)
+            last = min(int((point[axis] + radius - self.lower) // h) + 1,
+                       self.n)
+            if first >= last:
+                return
+
+            low = self.lower + h * np.arange(first, last) - point[axis]
+            far = np.maximum(np.abs(low), np.abs(low + h))
+
+            shape = [1] * self.dim
+            shape[axis] = last - first
+            box.append(slice(first, last))
+            distances.append((far * far).reshape(shape))
+
+        covered = sum(distances) <= radius * radius
+        self.free[tuple(box)] &= ~covered
+
+    def count(self):
+        """Кол-во свободных вокселей."""
+
+        if self.voxels is not None:
+            return len(self.voxels)
+
+        return int(np.count_nonzero(self.free))
+
+    def saturated(self):
+        """Свободного пространства не осталось."""
+
+        if self.voxels is not None:
+            return len(self.voxels) == 0
+
+        if self._indices is None:
+            self._indices = np.flatnonzero(self.free)
+
+        return self._indices.size == 0
+
+    def refine(self):
+        """Измельчить карту вдвое. Возвращает False при исчерпании точности."""
+
+        if self.h < 1e-9 * self.options['matrix']:
+            return False
+
+        if self.voxels is None and\
+                (2 * self.n) ** self.dim <= self.max_voxels and\
+                self.count() * len(self.children) > self.max_voxels // 64:
+            for axis in range(self.dim):
+                self.free = np.repeat(self.free, 2, axis=axis)
+            self.n *= 2
+
+            free = self.free
+            self.build()
+            self.free &= free  # дочерние воксели закрытых вокселей закрыты
+
+            return True
+
+        if self.voxels is None:  # переход к разреженной карте
+            self.voxels = np.argwhere(self.free)
+            self.free = None
+            self._indices = None
+
+        self.voxels = (2 * self.voxels[:, None, :] + self.children).reshape(
+            -1, self.dim)
+        self.n *= 2
+        h = self.h
+
+        low = self.lower + self.voxels * h
+        keep = ~np.any(self._forbidden(low), axis=1)
+
+        # проверка закрытия частицами: воксели группируются по ячейкам
+        # пространственного индекса, соседи ищутся один раз на ячейку
+        candidates = np.flatnonzero(keep)
+        cell = self.index.cell_size
+        keys = np.floor((low[candidates] + h / 2) / cell).astype(np.int64)
+        cells, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(cells) + 1))
+
+        radius = self.diameter / 2 + self.options['gap']
+
+        for c, key in enumerate(cells):
+            indices = self.index.neighbour_indices((key + 0.5) * cell)
+            if not indices:
+                continue
+
+            members = candidates[order[bounds[c]:bounds[c + 1]]]
+            delta = self.index.displacement(
+                low[members][:, None, :] + h / 2 -
+                self.index.points[indices]) - h / 2
+            far = np.maximum(np.abs(delta), np.abs(delta + h))
+            limit = radius + self.index.diameters[indices] / 2
+            covered = np.any(
+                np.einsum('ijk,ijk->ij', far, far) <= limit * limit, axis=1)
+            keep[members[covered]] = False
+
+        self.voxels = self.voxels[keep]
+
+        return True
+
+    def sample(self, size):
+        """
+        Пакет случайных центров из свободных вокселей (массив k x dim,
+        k <= size).
+
+        Список свободных вокселей плотной карты обновляется лениво:
+        кандидаты из вокселей, закрытых после его построения,
+        отбрасываются.
+
+        """
+
+        if self.voxels is not None:
+            if len(self.voxels) == 0:
+                return np.empty((0, self.dim))
+            voxels = self.voxels[self.rng.integers(0, len(self.voxels), size)]
+
+        else:
+            if self._indices is None:
+                self._indices = np.flatnonzero(self.free)
+            if self._indices.size == 0:
+                return np.empty((0, self.dim))
+
+            chosen = self._indices[
+                self.rng.integers(0, self._indices.size, size)]
+            still_free = self.free.ravel()[chosen]
+            if np.count_nonzero(still_free) < size / 2:
+                self._indices = None  # список устарел
+            chosen = chosen[still_free]
+
+            voxels = np.column_stack(
+                np.unravel_index(chosen, self.free.shape))
+
+        return self.lower + (voxels + self.rng.random(voxels.shape)) * self.h
+
+    def feedback(self, accepted, attempts):
+        """
+        Учесть результат проверки кандидатов; при низкой доле принятых
+        кандидатов измельчить карту.
+
+        """
+
+        self.accepted += accepted
+        self.attempts += attempts
+
+        if self.attempts >= self.window:
+            if self.accepted < self.threshold * self.attempts:
+                self.refine()
+            self.accepted = 0
+            self.attempts = 0
+
+
+if __name__ == '__main__':
+
+    import grid
+
+    opt = {'dim_ind': 1, 'var_ind': 1, 'matrix': 100., 'gap': 1.,
+           'boundary_repulsion': 20}
+
+    g = grid.UniformGrid(cell_size=41., dim=3)
+    g.insert((50., 50., 50.), 40.)
+
+    fs = FreeSpace(opt, 10., g)
+    print(fs)
+    print(fs.sample(5))
+    fs.refine()
+    print(fs)
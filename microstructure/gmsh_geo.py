@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль записи сценария Gmsh (.geo) модели "матрица + включения"
+"""
+
+import numpy as np
+import particle_files
+import shapes
+
+
+def _particles(particles, header):
+    """Массив строк x, y, z, d и заголовок по набору, массиву либо файлу."""
+
+    if isinstance(particles, str):
+        if particle_files.is_binary(particles):
+            array, stored = particle_files.open_npz(particles)
+            return np.asarray(array), dict(stored, **header)
+        loaded, _, _ = particle_files.load(particles)
+        return loaded.array(), dict({'dim': loaded.dim}, **header)
+
+    if isinstance(particles, shapes.ParticleSet):
+        return particles.array(), dict({'dim': particles.dim}, **header)
+
+    return np.asarray(particles, dtype=np.float64).reshape(-1, 4), header
+
+
+def write_geo(file, particles, matrix_edge=None, dim=None, var_ind=None,
+              mesh_size=None, chunk=2 ** 16):
+    """
+    Записать сценарий Gmsh (ядро OpenCASCADE): матрица (Box либо
+    Rectangle, метка 1), включения (Sphere либо Disk, метки 2, 3, ...),
+    BooleanFragments матрицы и включений и физические группы "matrix"
+    и "d=..." по фракциям.
+
+    particles - ParticleSet, массив строк x, y, z, d либо имя файла
+    распределения (.npz либо TSV); незаданные matrix_edge, dim и
+    var_ind берутся из заголовка файла .npz. Включения упорядочиваются
+    по диаметру, поэтому метки фракции идут подряд. Включения,
+    пересекающие грани матрицы, обрезаются по ней (BooleanIntersection);
+    при var_ind == 2 добавляются их периодические образы. Сценарий
+    записывается пакетами по chunk включений.
+
+    Возвращает кол-во включений.
+
+    """
+
+    header = {key: value for key, value in (
+        ('matrix', matrix_edge), ('dim', dim), ('var_ind', var_ind))
+        if value is not None}
+    array, header = _particles(particles, header)
+    if 'matrix' not in header:
+        raise ValueError('Не задан размер матрицы')
+    edge = float(header['matrix'])
+    dim = int(header.get('dim', 3))
+    var_ind = int(header.get('var_ind', 1))
+
+    order = np.argsort(array[:, 3], kind='stable')
+    points = array[order, :dim]
+    radii = array[order, 3] / 2
+    if var_ind == 2:  # периодические образы
+        points, radii, _ = shapes.periodic_images(points, radii, edge)
+        order = np.argsort(radii, kind='stable')
+        points, radii = points[order], radii[order]
+    else:  # включения вне матрицы не записываются
+        inside = np.all((points + radii[:, None] > 0) &
+                        (points - radii[:, None] < edge), axis=1)
+        points, radii = points[inside], radii[inside]
+
+    count = len(radii)
+    tags = np.arange(2, count + 2)
+    crossing = np.any((points - radii[:, None] < 0) |
+                      (points + radii[:, None] > edge), axis=1)
+
+    if dim == 3:
+        kind = 'Volume'
+        matrix = 'Box(1) = {{0, 0, 0, {0!r}, {0!r}, {0!r}}};\n'.format(edge)
+        shape = 'Sphere(%d) = {%.12g, %.12g, %.12g, %.12g};\n'
+    else:
+        kind = 'Surface'
+        matrix = 'Rectangle(1) = {{0, 0, 0, {0!r}, {0!r}}};\n'.format(edge)
+        shape = 'Disk(%d) = {%.12g, %.12g, 0, %.12g, %.12g};\n'
+
+    with open(file, 'w') as f:
+        f.write('// Microstructure: matrix + {0} inclusions\n'.format(count))
+        f.write('SetFactory("OpenCASCADE");\n')
+        f.write('Geometry.OCCBooleanPreserveNumbering = 1;\n')
+        if mesh_size is not None:
+            f.write('Mesh.CharacteristicLengthMax = {0!r};\n'.format(
+                float(mesh_size)))
+        f.write(matrix)
+
+        spare = count + 2  # временные метки обрезаемых включений
+        for low in range(0, count, chunk):
+            high = min(low + chunk, count)
+            cut = crossing[low:high]
+            written = np.where(cut, spare + np.cumsum(cut) - 1,
+                               tags[low:high])
+            spare += np.count_nonzero(cut)
+
+            # 3D: метка, x, y, z, r; 2D: метка, x, y, r, r
+            rows = np.column_stack(
+                (written, points[low:high], radii[low:high]) if dim == 3
+                else (written, points[low:high], radii[low:high],
+                      radii[low:high])).ravel()
+            f.write((shape * (high - low)) % tuple(rows))
+
+            for tag, temporary in zip(tags[low:high][cut], written[cut]):
+                f.write('BooleanIntersection({0}) = {{ {1}{{{2}}}; Delete; }}'
+                        '{{ {1}{{1}}; }};\n'.format(tag, kind, temporary))
+
+        if count:
+            f.write('BooleanFragments{{ {0}{{1}}; Delete; }}'
+                    '{{ {0}{{2:{1}}}; Delete; }};\n'.format(kind, count + 1))
+
+        # физические группы
+        f.write('Physical {0}("matrix", 1) = {{1}};\n'.format(kind))
+        diameters, first = np.unique(2 * radii, return_index=True)
+        last = np.append(first[1:], count)
+        for number, (d, a, b) in enumerate(zip(diameters, first, last)):
+            f.write('Physical {0}("d={1:g}", {2}) = {{{3}:{4}}};\n'.format(
+                kind, d, number + 2, a + 2, b + 1))
+
+    return count
+
+
+if __name__ == '__main__':
+
+    import os
+    import tempfile
+
+    ps = shapes.ParticleSet(dim=3)
+    ps.add(50., 50., 50., 20.)
+    ps.add(20., 20., 20., 10.)
+    ps.add(100., 50., 50., 20.)  # пересекает грань матрицы
+    name = os.path.join(tempfile.gettempdir(), 'model.geo')
+    write_geo(name, ps, matrix_edge=100., var_ind=1, mesh_size=5.)
+    with open(name) as geo:
+        print(geo.read())
+    os.remove(name)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль пространственного индекса частиц (равномерная сетка ячеек)
+"""
+
+import numpy as np
+
+SPAN = 2 ** 21  # диапазон индексов ячейки по оси в коде ячейки
+
+
+class UniformGrid:
+    """
+    Равномерная сетка ячеек для поиска соседних частиц.
+
+    Размер ячейки не меньше максимального расстояния взаимодействия двух
+    частиц (наибольший диаметр + зазор), поэтому для проверки пересечения
+    достаточно просмотреть ячейку частицы и соседние с ней ячейки.
+
+    Координаты центров и диаметры хранятся в массивах NumPy, ячейки
+    содержат индексы частиц в этих массивах. Для проверки пакета
+    кандидатов (overlap_batch) частицы дополнительно упорядочиваются по
+    кодам ячеек (массивы _codes и _order обновляются перед проверкой).
+
+    При заданном периоде period (периодические границы матрицы) сетка
+    замыкается: размер ячейки увеличивается до целой доли периода,
+    расстояния между частицами определяются по ближайшему образу.
+
+    """
+
+    def __init__(self, cell_size, dim=3, capacity=1024, period=None):
+        if cell_size <= 0:
+            raise ValueError('Размер ячейки должен быть положительным!')
+
+        self.period = period
+        self.ncells = None  # кол-во ячеек по оси (периодическая сетка)
+        if period is not None:
+            self.ncells = max(int(period // cell_size), 1)
+            cell_size = period / self.ncells
+
+        self.cell_size = cell_size
+        self.dim = dim  # размерность задачи (2 либо 3)
+        self.cells = {}  # индексы ячейки: список индексов частиц
+        self.size = 0  # кол-во частиц в индексе
+
+        self.points = np.empty((capacity, dim))  # координаты центров
+        self.diameters = np.empty(capacity)  # диаметры
+
+        self._codes = np.empty(0, dtype=np.int64)  # коды ячеек (возраст.)
+        self._order = np.empty(0, dtype=np.int64)  # частицы в порядке кодов
+        self._sorted = 0  # кол-во частиц, учтённых в _codes
+
+        if self.dim == 2:
+            self.offsets = [(i, j) for i in (-1, 0, 1) for j in (-1, 0, 1)]
+        else:
+            self.offsets = [(i, j, k) for i in (-1, 0, 1)
+                            for j in (-1, 0, 1) for k in (-1, 0, 1)]
+
+    def __str__(self):
+        return 'grid: cell={0:.3f}, cells={1}, particles={2}'.format(
+            self.cell_size, len(self.cells), self.size)
+
+    def __len__(self):
+        return self.size
+
+    def key(self, point):
+        """Индексы ячейки, в которую попадает точка."""
+
+        if self.period is not None:
+            return tuple(int(c // self.cell_size) % self.ncells
+                         for c in point)
+
+        return tuple(int(c // self.cell_size) for c in point)
+
+    def codes(self, points, offset=None):
+        """
+        Коды ячеек точек (массив k x dim), смещённых на offset ячеек:
+        целые числа, однозначно определяющие индексы ячеек.
+
+        """
+
+        keys = np.floor_divide(points, self.cell_size).astype(np.int64)
+        if offset is not None:
+            keys += offset
+        if self.period is not None:
+            keys %= self.ncells
+
+        code = np.zeros(len(keys), dtype=np.int64)
+        for axis in range(self.dim):
+            code = code * SPAN + (keys[:, axis] + SPAN // 2)
+
+        return code
+
+    def _grow(self):
+        """Увеличить ёмкость массивов вдвое."""
+
+        capacity = 2 * len(self.diameters)
+
+        points = np.empty((capacity, self.dim))
+        points[:self.size] = self.points[:self.size]
+        self.points = points
+
+        diameters = np.empty(capacity)
+        diameters[:self.size] = self.diameters[:self.size]
+        self.diameters = diameters
+
+    def insert(self, point, diameter):
+        """Добавить частицу (координаты центра, диаметр) в индекс."""
+
+        if self.size == len(self.diameters):
+            self._grow()
+
+        self.points[self.size] = point[:self.dim]
+        self.diameters[self.size] = diameter
+
+        self.cells.setdefault(self.key(point[:self.dim]), []).append(
+            self.size)
+        self.size += 1
+
+    def extend(self, points, diameters):
+        """Добавить в индекс набор частиц."""
+
+        for point, diameter in zip(points, diameters):
+            self.insert(point, diameter)
+
+    def neighbour_indices(self, point):
+        """Индексы частиц из ячейки точки и соседних с ней ячеек."""
+
+        key = self.key(point)
+
+        keys = [tuple(k + o for k, o in zip(key, offset))
+                for offset in self.offsets]
+        if self.period is not None:
+            keys = set(tuple(k % self.ncells for k in neighbour)
+                       for neighbour in keys)
+
+        indices = []
+        for neighbour in keys:
+            cell = self.cells.get(neighbour)
+            if cell:
+                indices.extend(cell)
+
+        return indices
+
+    def _sort(self):
+        """Добавить частицы, вставленные после прошлой проверки, в _codes."""
+
+        if self._sorted == self.size:
+            return
+
+        new = np.arange(self._sorted, self.size)
+        codes = self.codes(self.points[new])
+        order = np.argsort(codes, kind='stable')
+        codes, new = codes[order], new[order]
+
+        at = np.searchsorted(self._codes, codes)
+        self._codes = np.insert(self._codes, at, codes)
+        self._order = np.insert(self._order, at, new)
+        self._sorted = self.size
+
+    def displacement(self, delta):
+        """Векторы между центрами (по ближайшему образу при периоде)."""
+
+        if self.period is not None:
+            delta = delta - self.period * np.round(delta / self.period)
+
+        return delta
+
+    def overlap(self, point, diameter, gap):
+        """
+        Пересечение частицы (point, diameter) с частицами индекса.
+
+        Проверка выполняется одной операцией над массивом соседей
+        (с учётом зазора gap, касание считается пересечением).
+        Возвращает индекс первой мешающей частицы либо None.
+
+        """
+
+        indices = self.neighbour_indices(point)
+        if not indices:
+            return None
+
+        delta = self.displacement(self.points[indices] - point)
+        limit = diameter / 2 + self.diameters[indices] / 2 + gap
+
+        hits = np.flatnonzero(
+            np.einsum('ij,ij->i', delta, delta) <= limit * limit)
+        if hits.size:
+            return indices[hits[0]]
+
+        return None
+
+
+    def overlap_batch(self, points, diameter, gap):
+        """
+        Пересечения частиц пакета (центры points, общий диаметр diameter)
+        с частицами индекса: индекс мешающей частицы для каждой точки
+        либо -1.
+
+        Для каждого смещения соседней ячейки частицы-соседи всех точек
+        находятся двоичным поиском кодов ячеек и проверяются одной
+        операцией над массивами (без цикла по точкам).
+
+        """
+
+        self._sort()
+
+        points = np.asarray(points, dtype=np.float64).reshape(-1, self.dim)
+        result = np.full(len(points), -1, dtype=np.int64)
+        if not self.size or not len(points):
+            return result
+
+        for offset in self.offsets:
+            codes = self.codes(points, offset)
+            low = np.searchsorted(self._codes, codes, side='left')
+            counts = np.searchsorted(self._codes, codes, side='right') - low
+            total = int(counts.sum())
+            if not total:
+                continue
+
+            # пары (точка пакета, частица индекса из ячейки)
+            which = np.repeat(np.arange(len(points)), counts)
+            position = np.arange(total) + np.repeat(
+                low - (np.cumsum(counts) - counts), counts)
+            others = self._order[position]
+
+            delta = self.displacement(self.points[others] - points[which])
+            limit = diameter / 2 + self.diameters[others] / 2 + gap
+            hit = np.einsum('ij,ij->i', delta, delta) <= limit * limit
+            result[which[hit]] = others[hit]
+
+        return result
+
+    def overlap_since(self, first, point, diameter, gap):
+        """
+        Пересечение частицы (point, diameter) с частицами индекса с
+        номерами first и больше (добавленными после проверки пакета):
+        индекс мешающей частицы либо -1.
+
+        """
+
+        if first >= self.size:
+            return -1
+
+        delta = self.displacement(self.points[first:self.size] - point)
+        limit = diameter / 2 + self.diameters[first:self.size] / 2 + gap
+
+        hits = np.flatnonzero(
+            np.einsum('ij,ij->i', delta, delta) <= limit * limit)
+        if hits.size:
+            return first + int(hits[0])
+
+        return -1
+
+
+def cell_size(options, diameters=()):
+    """
+    Размер ячейки сетки: наибольший диаметр частиц + зазор.
+
+    Учитываются диаметры фракций и уже имеющихся (загруженных) частиц.
+
+    """
+
+    largest = max((d for d, _ in options['fractions_definition']), default=0)
+    if len(diameters):
+        largest = max(largest, np.max(diameters))
+
+    return largest + options['gap']
+
+
+if __name__ == '__main__':
+
+    g = UniformGrid(cell_size=21., dim=3)
+    g.extend([(10., 10., 10.), (50., 50., 50.)], [20., 20.])
+    print(g)
+
+    p = (25., 20., 15.)
+    print('neighbours={0}'.format(g.neighbour_indices(p)))
+    print('overlap={0}'.format(g.overlap(p, 10., 1.)))
+    print('overlap={0}'.format(g.overlap(p, 20., 1.)))
+    print('overlap_batch={0}'.format(
+        g.overlap_batch([p, (80., 80., 80.)], 20., 1.)))
+
+    g = UniformGrid(cell_size=21., dim=3, period=100.)
+    g.insert((5., 50., 50.), 20.)
+    print(g)
+    print('overlap={0}'.format(g.overlap((95., 50., 50.), 10., 1.)))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль измерения времени импорта вычислительных модулей (холодный старт)
+
+Каждый модуль импортируется в новом процессе интерпретатора, в котором
+импорт графических пакетов (GUI_PACKAGES) запрещён: так проверяется,
+что вычислительное ядро работает без Qt и matplotlib.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# вычислительные модули (без графического интерфейса)
+MODULES = ('defaults', 'events', 'shapes', 'grid', 'fill_deg', 'free_space',
+           'placement', 'densification', 'audit', 'ensemble', 'lattice',
+           'particle_files', 'sections', 'voxels', 'tessellation',
+           'gmsh_geo', 'random_creation', 'cli')
+
+GUI_PACKAGES = ('PyQt5', 'matplotlib')
+
+# программа процесса-измерителя
+CHILD = '''
+import json, sys, time
+for name in {blocked!r}:
+    sys.modules[name] = None  # импорт пакета вызывает ImportError
+start = time.perf_counter()
+error = None
+try:
+    import {module}
+except ImportError as exception:
+    error = str(exception)
+print(json.dumps({{'elapsed': time.perf_counter() - start, 'error': error,
+                  'modules': len(sys.modules)}}))
+'''
+
+
+def measure(module, repeat=3, blocked=GUI_PACKAGES):
+    """
+    Время импорта модуля module (наименьшее из repeat новых процессов):
+    словарь с временем импорта elapsed, временем процесса process,
+    кол-вом загруженных модулей и ошибкой импорта error (None - нет).
+
+    """
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    code = CHILD.format(module=module, blocked=tuple(blocked))
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=directory,
+            capture_output=True, text=True, check=True).stdout
+        result = json.loads(output)
+        result['process'] = time.perf_counter() - start
+        if best is None or result['elapsed'] < best['elapsed']:
+            best = result
+    best['module'] = module
+
+    return best
+
+
+def benchmark(modules=MODULES, repeat=3):
+    """Время импорта модулей modules (список словарей, см. measure)."""
+
+    return [measure(module, repeat) for module in modules]
+
+
+def main(argv=None):
+    """Точка входа; код завершения 1, если модуль требует Qt/matplotlib."""
+
+    parser = argparse.ArgumentParser(
+        description='Время импорта вычислительных модулей')
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('--json', help='файл результатов (JSON)')
+    args = parser.parse_args(argv)
+
+    results = benchmark(args.modules, args.repeat)
+
+    print('{0:16} {1:>10} {2:>11} {3:>8}'.format(
+        'module', 'import, ms', 'process, ms', 'modules'))
+    for r in results:
+        print('{0:16} {1:10.1f} {2:11.1f} {3:8d}{4}'.format(
+            r['module'], 1000 * r['elapsed'], 1000 * r['process'],
+            r['modules'], '' if r['error'] is None else
+            '  ОШИБКА: {0}'.format(r['error'])))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    return 1 if any(r['error'] is not None for r in results) else 0
+
+
+if __name__ == '__main__':
+
+    sys.exit(main())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль создания регулярных (решёточных) распределений частиц
+"""
+
+import numpy as np
+import shapes
+
+LATTICES = ('SC', 'BCC', 'FCC', 'HCP')  # виды решёток (lattice_ind)
+
+# узлы элементарной ячейки (доли рёбер ячейки): 2D, 3D
+BASES = {
+    'SC': ([[0., 0.]],
+           [[0., 0., 0.]]),
+    'BCC': ([[0., 0.], [.5, .5]],
+            [[0., 0., 0.], [.5, .5, .5]]),
+    'FCC': ([[0., 0.], [.5, .5]],
+            [[0., 0., 0.], [.5, .5, 0.], [.5, 0., .5], [0., .5, .5]]),
+    # ортогональная ячейка гексагональной решётки (a, a*sqrt(3), c)
+    'HCP': ([[0., 0.], [.5, .5]],
+            [[0., 0., 0.], [.5, .5, 0.], [.5, 1 / 6, .5], [0., 2 / 3, .5]]),
+}
+
+
+def basis(kind, dim):
+    """Узлы элементарной ячейки решётки kind (массив k x dim)."""
+
+    return np.array(BASES[kind][dim - 2])
+
+
+def dense_increment(kind, dim, distance):
+    """
+    Рёбра элементарной ячейки решётки kind, при которых расстояние между
+    ближайшими узлами равно distance (плотная упаковка частиц диаметра
+    distance - зазор).
+
+    """
+
+    if kind == 'SC':
+        ratio = [1.] * dim
+    elif kind == 'HCP':
+        ratio = [1., np.sqrt(3.), np.sqrt(8 / 3)][:dim]
+    elif kind == 'BCC' and dim == 3:
+        ratio = [2 / np.sqrt(3.)] * dim
+    else:  # FCC, в 2D - также BCC (центрированная квадратная решётка)
+        ratio = [np.sqrt(2.)] * dim
+
+    return distance * np.array(ratio)
+
+
+def jitter_points(points, amplitude, rng=np.random):
+    """
+    Случайно сместить узлы (равномерно в круге/шаре радиуса amplitude).
+
+    """
+
+    n, dim = points.shape
+    direction = rng.normal(size=(n, dim))
+    direction /= np.linalg.norm(direction, axis=1)[:, None]
+    length = amplitude * rng.random(n) ** (1 / dim)
+
+    return points + direction * length[:, None]
+
+
+def nodes(origin, increment, count, kind='SC', jitter=0., rng=None):
+    """
+    Узлы решётки kind: count ячеек с рёбрами increment по каждой оси
+    от начала отсчёта origin (массив N x dim).
+
+    Узлы строятся сложением (broadcast) сдвигов ячеек и узлов
+    элементарной ячейки. jitter - наибольшее случайное смещение узла.
+
+    """
+
+    origin = np.asarray(origin, dtype=np.float64)
+    increment = np.asarray(increment, dtype=np.float64)
+    dim = len(origin)
+
+    cells = np.indices(np.asarray(count, dtype=np.int64)).reshape(dim, -1).T
+    points = origin + (cells[:, None, :] + basis(kind, dim)[None, :, :]) \
+        * increment
+    points = points.reshape(-1, dim)
+
+    if jitter > 0:
+        points = jitter_points(points, jitter, np.random.default_rng(rng))
+
+    return points
+
+
+def particles(points, diameter):
+    """Набор частиц одного диаметра с центрами в узлах points."""
+
+    dim = points.shape[1]
+    array = np.zeros((len(points), 4))
+    array[:, :dim] = points
+    array[:, 3] = diameter
+
+    return shapes.ParticleSet.from_array(array, dim=dim)
+
+
+def jitter_amplitude(options):
+    """
+    Наибольшее случайное смещение узла: доля options['jitter'] половины
+    зазора (соседние частицы плотной решётки не сближаются больше,
+    чем на зазор).
+
+    """
+
+    return min(max(options.get('jitter', 0.), 0.), 1.) * options['gap'] / 2
+
+
+def generate(options, rng=None):
+    """
+    Регулярное распределение частиц по таблице
+    options['regular_distribution'] (начало отсчёта, рёбра ячейки,
+    количество ячеек по осям), диаметру
+    options['regular_distribution_diameter'] и виду решётки
+    options['lattice_ind'].
+
+    """
+
+    dim = options['dim_ind'] + 2
+    origin, increment, count = (
+        row[:dim] for row in options['regular_distribution'])
+
+    points = nodes(origin, increment, count,
+                   LATTICES[options.get('lattice_ind', 0)],
+                   jitter_amplitude(options), rng)
+
+    return particles(points, options['regular_distribution_diameter'])
+
+
+def dense(options, diameter, kind='FCC', rng=None):
+    """
+    Плотная решётка kind частиц диаметра diameter (с зазором
+    options['gap']), заполняющая матрицу с учётом options['var_ind'];
+    может служить начальным состоянием неупорядоченных структур.
+
+    """
+
+    dim = options['dim_ind'] + 2
+    edge = options['matrix']
+    increment = dense_increment(kind, dim, diameter + options['gap'])
+    jitter = jitter_amplitude(options)
+
+    if options['var_ind'] == 2:  # периодически
+        # ячейки растягиваются до целого их числа на ребре матрицы
+        count = np.maximum(np.floor(edge / increment), 1).astype(np.int64)
+        points = nodes(np.zeros(dim), edge / count, count, kind, jitter,
+                       rng) % edge
+        return particles(points, diameter)
+
+    if options['var_ind'] == 0:  # частицы целиком в матрице
+        low, high = diameter / 2 + jitter, edge - diameter / 2 - jitter
+    else:  # центры частиц в матрице
+        low, high = 0., edge
+
+    count = np.floor((high - low) / increment).astype(np.int64) + 1
+    points = nodes(np.full(dim, low), increment, np.maximum(count, 0),
+                   kind, jitter, rng)
+    points = points[np.all((points >= low) & (points <= high), axis=1)]
+
+    return particles(points, diameter)
+
+
+if __name__ == '__main__':
+
+    import time
+
+    opt = {'dim_ind': 1, 'var_ind': 0, 'matrix': 100., 'gap': 1.,
+           'jitter': 1.,
+           'regular_distribution': [[0, 0, 0], [30, 30, 30], [3, 3, 3]],
+           'regular_distribution_diameter': 20., 'lattice_ind': 2}
+
+    print(generate(opt, rng=1))
+
+    for name in LATTICES:
+        start = time.perf_counter()
+        ps = dense(dict(opt, matrix=1000.), 10., name, rng=1)
+        print(name, len(ps), 'filling={0:.4f}'.format(
+            len(ps) * np.pi / 6 * 10. ** 3 / 1000. ** 3),
+              'time={0:.3f} s'.format(time.perf_counter() - start))
@@ -5,13 +5,9 @@
 Программа рассчитывает заполнение микрообъёма частицами
 """
 
-import csv
 import os
 import sys
 import webbrowser
-import matplotlib.patches as patches
-import matplotlib.pyplot as plt
-import numpy as np
 from PyQt5 import uic, Qt, QtCore, QtWidgets, QtGui
 from builtins import float
 
@@ -28,21 +24,13 @@ class Application(QtWidgets.QMainWindow):
         self.copyright = '© Alexander Shchemelinin <alexshch82@gmail.com>, 2020'
         self.help = 'F1: Help'
 
-        self.options = {
-            'dim_tup': ('2D', '3D'),
-            'dim_ind': 1,
-            'var_tup': ('целиком', 'частично'),
-            'var_ind': 1,
-            'def_tup': ('количество частиц', 'степень заполнения'),
-            'def_ind': 1,
-            'matrix': 100.,
-            'gap': 1.,
-            'boundary_repulsion': 20,
-            'max_iter': 1000,
-            'fractions_definition': [[50., 0.5], ],
-            'regular_distribution': [[0, 0, 0], [30, 30, 30], [3, 3, 3]],
-            'regular_distribution_diameter': 20.
-        }
+        import defaults
+        self.options = defaults.options()
+
+        import events
+        self.console = events.Console(maxlen=1000)
+        # строки графической консоли (кольцевой буфер)
+        self.textEdit.document().setMaximumBlockCount(self.console.maxlen)
 
         self.working_directory()
 
@@ -50,13 +38,12 @@ class Application(QtWidgets.QMainWindow):
 
         # признак активизации расчёта распределения частиц
         self.process_running = False
+        self.worker = None  # фоновый поток расчёта
+        self.seed = None  # зерно последнего случайного распределения
 
-        self.all_particles = []  # все имеющиеся распределения частиц
-        self.random_particles = []  # случайное распределение частиц
         # загруженные файлы (формат строки файла частиц: x, y, z, diameter)
         self.loaded_files = []
-        self.loaded_particles = []  # загруженные из файла частицы
-        self.regular_particles = []  # частицы с регулярным распределением
+        self.new_particle_sets()
 
         super().setWindowTitle(self.program)
 
@@ -83,7 +70,9 @@ class Application(QtWidgets.QMainWindow):
             'Выход', self)
         self.exit_action.setShortcut('Ctrl+Q')
         self.exit_action.setStatusTip('Выход из программы')
-        self.exit_action.triggered.connect(QtWidgets.qApp.quit)
+        self.exit_action.triggered.connect(self.close)
+        QtWidgets.qApp.aboutToQuit.connect(self.stop_worker)
+        # фоновый поток расчёта завершается до выхода из программы
         self.toolbar1.addAction(self.exit_action)
 
         self.toolbar1.addSeparator()
@@ -170,11 +159,24 @@ class Application(QtWidgets.QMainWindow):
         self.visualisation.triggered.connect(
             lambda: self.plot(self.all_particles))
         self.saveAll.triggered.connect(
-            lambda: self.save_all_to_file(self.all_particles))
+            lambda: self.save_all_to_file(self.all_particles, self.seed))
         self.filling.triggered.connect(self.filling_degree)
 
         self.disable_menus()
 
+    def closeEvent(self, event):
+        """Закрытие окна (в том числе выход из программы)."""
+
+        self.stop_worker()
+        event.accept()
+
+    def stop_worker(self):
+        """Остановить расчёт и дождаться завершения фонового потока."""
+
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.token.cancel()
+            self.worker.wait()
+
     def keyPressEvent(self, event):
         """Запуск файла помощи в браузере по-умолчанию."""
 
@@ -211,12 +213,28 @@ class Application(QtWidgets.QMainWindow):
                                    'work_dir.txt'), 'w') as f:
                 f.write(self.work_dir)
 
-            self.textEdit.clear()  # очистить консоль
+            self.clear_console()
 
             self.message('Выбран рабочий каталог: ' + self.work_dir)
 
             self.disable_menus()
 
+    def new_particle_sets(self):
+        """Пустые наборы частиц (ParticleSet)."""
+
+        import shapes
+
+        dim = self.options['dim_ind'] + 2
+
+        self.all_particles = shapes.ParticleSet(dim)
+        # все имеющиеся распределения частиц
+        self.random_particles = shapes.ParticleSet(dim)
+        # случайное распределение частиц
+        self.loaded_particles = shapes.ParticleSet(dim)
+        # загруженные из файла частицы
+        self.regular_particles = shapes.ParticleSet(dim)
+        # частицы с регулярным распределением
+
     def disable_menus(self):
         """Настройка изначальной доступности пунктов меню."""
 
@@ -225,16 +243,25 @@ class Application(QtWidgets.QMainWindow):
         self.saveAll.setDisabled(True)
 
     def process_stop(self):
-        self.process_running = False
-        self.processStart.setEnabled(True)
+        """Остановить расчёт распределения частиц."""
+
+        if self.worker is not None:
+            self.worker.token.cancel()
         self.processStop.setDisabled(True)
 
     def message(self, message):
         """Вывод сообщений в графическую консоль."""
 
         zap_gui = '$ '
+        self.console.append(zap_gui + message)
         self.textEdit.append(zap_gui + message)
 
+    def clear_console(self):
+        """Очистить графическую консоль."""
+
+        self.console.clear()
+        self.textEdit.clear()
+
     def edit_options(self):
         import options
         self.dialog1 = options.EditOptions(self.message, self.options)
@@ -257,29 +284,28 @@ class Application(QtWidgets.QMainWindow):
 
         import random_creation
 
+        if self.process_running:
+            return
+
         if self.options['def_ind'] == 0:  # кол-во частиц
             random_creation.preset_particles_number(self)
         elif self.options['def_ind'] == 1:  # степень заполнения
             random_creation.preset_filling_degree(self)
+        elif self.options['def_ind'] == 2:  # уплотнение
+            random_creation.densification(self)
 
     def filling_degree(self):
         """Расчёт степени заполнения."""
 
-        import shapes
+        import placement
         import fill_deg
 
-        space = {}  # площадь либо объём
-
-        if self.options['dim_ind'] == 0:  # 2D
-            matrix = shapes.SquareMatrix(self.options['matrix'])
-        elif self.options['dim_ind'] == 1:  # 3D
-            matrix = shapes.CubeMatrix(self.options['matrix'])
+        matrix = placement.matrix(self.options)
 
-        for particle in self.all_particles:
-            if particle.d in space:
-                space[particle.d] += fill_deg.space(matrix, particle)
-            else:
-                space[particle.d] = fill_deg.space(matrix, particle)
+        space = fill_deg.fractions_spaces(
+            matrix, self.all_particles.points(), self.all_particles.d,
+            periodic=self.options['var_ind'] == 2)
+        # площадь либо объём по диаметрам частиц
 
         for diameter in sorted(space):
             self.fractions_filling_degree[diameter] = fill_deg.filling(
@@ -294,14 +320,23 @@ class Application(QtWidgets.QMainWindow):
             '<font color="brown"><b>KV = {0:.3f}, по всем фракциям<b></font>'.
             format(sum(self.fractions_filling_degree.values())))
 
+    def check_distribution(self):
+        """Проверка общего распределения частиц (пересечения, зазоры)."""
+
+        import audit
+
+        report = audit.audit(self.options, self.all_particles)
+        for line in audit.describe(report, self.all_particles):
+            self.message(line)
+
+        return report
+
     def plot(self, data):
         """Визуализация матрицы с частицами."""
 
-        plt.close('all')
-        plt.figure(num='Микроструктура {0}'.format(
-            self.options['dim_tup'][self.options['dim_ind']]),\
-                figsize=(7, 7), dpi=100)
+        import visu
 
+        title = None
         if self.fractions_filling_degree:
             title = ''
             for diameter in self.fractions_filling_degree:
@@ -309,115 +344,86 @@ class Application(QtWidgets.QMainWindow):
                     diameter, self.fractions_filling_degree[diameter])
             title += 'ALL={0:.3f}'.format(
                 sum(self.fractions_filling_degree.values()))
-            plt.title(title)
-
-        ax = plt.axes()
-
-        plt.xlim(0, self.options['matrix'])
-        plt.ylim(0, self.options['matrix'])
-
-        data_list = []
-        for i in data:
-            if 'z' in i.__dict__:  # 3D
-                data_list.append((i.x, i.y, i.z, i.d))
-            else:  # 2D
-                data_list.append((i.x, i.y, 0., i.d))
-
-        array = np.array(
-            data_list, dtype=[('x', np.float64), ('y', np.float64),
-                              ('z', np.float64), ('d', np.float64)])
-        array.sort(order='z')  # сортировка по оси "z"
 
-        for x, y, _, d in array:
-            cir = patches.Circle(
-                (x, y), radius=d/2, fill=True,
-                edgecolor='black', facecolor='gray', alpha=0.7)
-            ax.add_patch(cir)
-
-        plt.xlabel('X')
-        plt.ylabel('Y')
-
-        plt.show()
+        if self.options['dim_ind'] == 1:  # 3D
+            visu.View3D(self.options['matrix'], data, title=title)
+        else:  # 2D
+            visu.View2D(self.options['matrix'], data, title=title)
 
     def clean_distributions(self):
         """Очистить все распределения."""
 
         self.loaded_files = []
-        self.loaded_particles = []
-        self.regular_particles = []
-        self.random_particles = []
-        self.all_particles = []
+        self.new_particle_sets()
         self.fractions_filling_degree = {}
+        self.seed = None
 
         self.message('Распределение частиц очищено')
         self.cleanDistributions.setDisabled(True)
 
     def load_from_file(self):
-        """Загрузить распределение из файла."""
+        """Загрузить распределение из файла (одного либо нескольких)."""
 
-        try:
-            loaded_file, _ = QtWidgets.QFileDialog.getOpenFileName(
-                None, 'Введите имя файла', self.work_dir,
-                'Файлы распределений частиц (*.tsv)')
-
-            self.loaded_files.append(loaded_file)
+        import particle_files
 
-            import shapes
+        loaded_files, _ = QtWidgets.QFileDialog.getOpenFileNames(
+            None, 'Введите имя файла', self.work_dir,
+            'Файлы распределений частиц (*.npz *.tsv)')
 
-            with open(loaded_file, 'r') as f:
-                loaded = []
-                for strings_list in csv.reader(f, delimiter='\t'):
-                    numbers_list = []
-                    for string in strings_list:
-                        numbers_list.append(float(string))
-                    loaded.append(tuple(numbers_list))
-
-                # определение размерности задачи
-                for i in loaded:
-                    if i[2]:  # хотя бы один параметр z != 0
-                        self.options['dim_ind'] = 1
-                        break
+        if not loaded_files:
+            self.message(
+                'Распределение не загружено!\nПричина: не введено имя файла')
+            return
 
-                for i in loaded:
-                    if self.options['dim_ind'] == 0:  # 2D
-                        self.loaded_particles.append(
-                            shapes.Circle(x=i[0], y=i[1], d=i[3]))
-                    elif self.options['dim_ind'] == 1:  # 3D
-                        self.loaded_particles.append(
-                            shapes.Sphere(x=i[0], y=i[1], z=i[2], d=i[3]))
+        try:
+            loaded, counts, headers = particle_files.load(loaded_files)
+        except (OSError, ValueError) as error:
+            self.message(
+                'Распределение не загружено!\nПричина: {0}'.format(error))
+            return
 
-                self.message('Загружен файл: {0}'.format(loaded_file))
+        # определение размерности задачи (хотя бы один параметр z != 0)
+        if loaded.dim == 3:
+            self.options['dim_ind'] = 1
 
-            self.all_particles.extend(self.loaded_particles)
+        for loaded_file, count, header in zip(loaded_files, counts, headers):
+            self.loaded_files.append(loaded_file)
+            self.message('Загружен файл: {0} (частиц: {1})'.format(
+                loaded_file, count))
+            if header:
+                self.message('Параметры расчёта: {0}'.format(', '.join(
+                    '{0} = {1}'.format(key, value)
+                    for key, value in header.items())))
 
-            self.cleanDistributions.setEnabled(True)
+        # в общий набор добавляются только вновь загруженные частицы
+        self.loaded_particles.extend(loaded)
+        self.loaded_particles.dim = self.options['dim_ind'] + 2
+        self.all_particles.extend(loaded)
+        self.all_particles.dim = self.loaded_particles.dim
 
-        except FileNotFoundError:
-            self.message(
-                'Распределение не загружено!\nПричина: не введено имя файла')
+        self.check_distribution()
 
-    def save_all_to_file(self, data):
-        """Сохранить распределение в файл."""
+        self.cleanDistributions.setEnabled(True)
 
-        data_list = []
-        for i in data:
-            if 'z' in i.__dict__:  # 3D
-                data_list.append((i.x, i.y, i.z, i.d))
-            else:  # 2D
-                data_list.append((i.x, i.y, 0., i.d))
+    def save_all_to_file(self, data, seed=None):
+        """Сохранить распределение в файл (seed - зерно расчёта)."""
 
-        array = np.array(data_list)
+        import particle_files
 
         try:
             file_name = os.path.join(
                 self.work_dir,
-                '{0}.tsv'.format(
+                '{0}.npz'.format(
                     self.options['dim_tup'][self.options['dim_ind']]))
             file, _ = QtWidgets.QFileDialog.getSaveFileName(
                 None, 'Введите имя файла', file_name,
-                'Файлы распределений частиц (*.tsv)')
+                'Двоичные файлы распределений частиц (*.npz);;'
+                'Текстовые файлы распределений частиц (*.tsv)')
 
-            np.savetxt(file, array, delimiter='\t')
+            # .npz - с параметрами расчёта и зерном, .tsv - экспорт
+            extra = {} if seed is None else {'entropy': seed}
+            particle_files.save(
+                file, data, particle_files.metadata(self.options, **extra))
             self.message('Сохранён файл: {0}'.format(file))
 
         except FileNotFoundError:
@@ -20,6 +20,7 @@ class EditOptions(QtWidgets.QDialog):
         self.max_gap = 100.
         self.max_boundary_repulsion = 100
         self.max_iter = 1000000
+        self.max_batch_size = 100000
 
         self.init_ui()
 
@@ -36,6 +37,10 @@ class EditOptions(QtWidgets.QDialog):
             definition.setCurrentIndex(index)
             self.options['def_ind'] = index
 
+        def sampling_save(index):
+            sampling.setCurrentIndex(index)
+            self.options['sampling_ind'] = index
+
         dimension = QtWidgets.QComboBox()
         dimension.addItem(self.options['dim_tup'][0])
         dimension.addItem(self.options['dim_tup'][1])
@@ -45,20 +50,29 @@ class EditOptions(QtWidgets.QDialog):
         variant = QtWidgets.QComboBox()
         variant.addItem(self.options['var_tup'][0])
         variant.addItem(self.options['var_tup'][1])
+        variant.addItem(self.options['var_tup'][2])
         variant.setCurrentIndex(self.options['var_ind'])
         variant.currentIndexChanged.connect(var_save)
 
         definition = QtWidgets.QComboBox()
         definition.addItem(self.options['def_tup'][0])
         definition.addItem(self.options['def_tup'][1])
+        definition.addItem(self.options['def_tup'][2])
         definition.setCurrentIndex(self.options['def_ind'])
         definition.currentIndexChanged.connect(def_save)
 
+        sampling = QtWidgets.QComboBox()
+        sampling.addItem(self.options['sampling_tup'][0])
+        sampling.addItem(self.options['sampling_tup'][1])
+        sampling.setCurrentIndex(self.options['sampling_ind'])
+        sampling.currentIndexChanged.connect(sampling_save)
+
         def number_save():
             self.options['matrix'] = matrix.value()
             self.options['gap'] = gap.value()
             self.options['boundary_repulsion'] = boundary_repulsion.value()
             self.options['max_iter'] = max_iter.value()
+            self.options['batch_size'] = batch_size.value()
 
         matrix = QtWidgets.QDoubleSpinBox()
         matrix.setRange(0.1, self.max_matrix)
@@ -86,15 +100,23 @@ class EditOptions(QtWidgets.QDialog):
         max_iter.setValue(self.options['max_iter'])
         max_iter.editingFinished.connect(number_save)
 
+        batch_size = QtWidgets.QSpinBox()
+        batch_size.setSingleStep(1)
+        batch_size.setRange(1, self.max_batch_size)
+        batch_size.setValue(self.options['batch_size'])
+        batch_size.editingFinished.connect(number_save)
+
         form = QtWidgets.QFormLayout()
 
         form.addRow("&Размерность задачи", dimension)
         form.addRow("&Частицы находятся в матрице", variant)
         form.addRow("&Определение фракций", definition)
+        form.addRow("&Выбор центров частиц", sampling)
         form.addRow("Размер &матрицы", matrix)
         form.addRow("&Зазор между частицами", gap)
         form.addRow("&Граничное отталкивание (%)", boundary_repulsion)
         form.addRow("Количество &итераций", max_iter)
+        form.addRow("Размер &пакета кандидатов", batch_size)
 
         self.setLayout(form)
 
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль чтения и записи файлов распределений частиц
+
+Форматы файлов:
+    .tsv - текст, строки x, y, z, d (экспорт, совместимость);
+    .npz - двоичный: массив particles (N x 4, строки x, y, z, d) и
+           заголовок metadata (строка JSON с параметрами расчёта);
+           архив без сжатия, поэтому массив частиц отображается
+           в память (open_npz) без полной загрузки.
+"""
+
+import json
+import os
+import struct
+import warnings
+import zipfile
+import numpy as np
+import shapes
+
+FORMAT = 'microstructure-particles'  # признак формата заголовка .npz
+VERSION = 1
+
+# параметры расчёта, сохраняемые в заголовке
+METADATA_OPTIONS = ('dim_ind', 'var_ind', 'def_ind', 'sampling_ind',
+                    'matrix', 'gap', 'boundary_repulsion',
+                    'fractions_definition')
+
+ROWS = 2 ** 20  # кол-во строк в блоке при чтении .npz
+
+
+def read_tsv(file, block_size=2 ** 24):
+    """
+    Прочитать файл распределения частиц TSV по блокам (генератор
+    массивов строк x, y, z, d).
+
+    Файл читается блоками около block_size символов, каждый блок
+    разбирается одним вызовом NumPy. Допускаются строки из трёх
+    столбцов (x, y, d - 2D).
+
+    """
+
+    columns = None
+    rest = ''
+
+    with open(file, 'r') as f:
+        while True:
+            block = f.read(block_size)
+            text = rest + block
+            if not block:
+                rest = ''
+            else:
+                end = text.rfind('\n') + 1
+                text, rest = text[:end], text[end:]
+                if not text:
+                    continue
+
+            if columns is None:
+                first = next((line for line in text.splitlines()
+                              if line.strip()), None)
+                if first is None:
+                    if not block:
+                        return
+                    continue
+                columns = len(first.split())
+                if columns not in (3, 4):
+                    raise ValueError(
+                        'Неверный формат файла {0}: {1} столбца(-ов)'.format(
+                            file, columns))
+
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', DeprecationWarning)
+                try:
+                    values = np.fromstring(text, dtype=np.float64, sep=' ')
+                except (DeprecationWarning, ValueError):
+                    raise ValueError(
+                        'Неверный формат файла {0}'.format(file)) from None
+
+            if values.size % columns:
+                raise ValueError('Неверный формат файла {0}'.format(file))
+
+            rows = values.reshape(-1, columns)
+            if columns == 3:
+                rows = np.column_stack(
+                    (rows[:, :2], np.zeros(len(rows)), rows[:, 2]))
+            if len(rows):
+                yield rows
+
+            if not block:
+                return
+
+
+def metadata(options, **extra):
+    """
+    Заголовок файла распределения частиц: параметры расчёта options
+    и дополнительные сведения extra (например, зерно расчёта).
+
+    """
+
+    header = {'format': FORMAT, 'version': VERSION,
+              'dim': options['dim_ind'] + 2}
+    header.update({key: options[key] for key in METADATA_OPTIONS
+                   if key in options})
+    header.update(extra)
+
+    return header
+
+
+def _member_offset(file, name):
+    """
+    Смещение данных несжатого члена name архива .npz от начала файла
+    (None - член сжат).
+
+    """
+
+    with zipfile.ZipFile(file) as archive:
+        info = archive.getinfo(name)
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    with open(file, 'rb') as f:
+        f.seek(info.header_offset)
+        local = f.read(30)  # локальный заголовок члена архива
+    name_length, extra_length = struct.unpack('<HH', local[26:30])
+
+    return info.header_offset + 30 + name_length + extra_length
+
+
+def open_npz(file, mmap_mode='r'):
+    """
+    Открыть файл .npz: возвращает массив частиц (N x 4, строки x, y, z, d)
+    и заголовок (словарь; пустой, если заголовка нет).
+
+    Массив несжатого архива отображается в память (np.memmap с режимом
+    mmap_mode), т.е. срезы огромных распределений читаются без полной
+    загрузки файла; при mmap_mode=None либо сжатом архиве массив
+    загружается целиком.
+
+    """
+
+    with np.load(file) as archive:
+        header = json.loads(str(archive['metadata'])) \
+            if 'metadata' in archive.files else {}
+        offset = None if mmap_mode is None else \
+            _member_offset(file, 'particles.npy')
+        if offset is None:
+            return archive['particles'], header
+
+    with open(file, 'rb') as f:
+        f.seek(offset)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = \
+                np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = \
+                np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    array = np.memmap(file, dtype=dtype, mode=mmap_mode, offset=offset,
+                      shape=shape, order='F' if fortran_order else 'C')
+
+    return array, header
+
+
+def read_npz(file, rows=ROWS):
+    """
+    Прочитать файл .npz по блокам не более rows строк (генератор
+    массивов строк x, y, z, d).
+
+    """
+
+    array, _ = open_npz(file)
+    for low in range(0, len(array), rows):
+        yield np.array(array[low:low + rows], dtype=np.float64)
+
+
+def is_binary(file):
+    """Файл двоичного формата (.npz)."""
+
+    return os.path.splitext(file)[1].lower() == '.npz'
+
+
+def read(file, block_size=2 ** 24):
+    """Прочитать файл распределения частиц (.npz либо TSV) по блокам."""
+
+    if is_binary(file):
+        return read_npz(file)
+
+    return read_tsv(file, block_size)
+
+
+def load(files, particles=None, block_size=2 ** 24):
+    """
+    Загрузить частицы из одного либо нескольких файлов (.npz либо TSV).
+
+    Частицы добавляются в набор particles (по умолчанию - новый).
+    Размерность определяется одной векторной проверкой по блокам:
+    хотя бы один z != 0 - 3D (размерность имеющегося 3D набора
+    сохраняется). Возвращает набор частиц, список кол-в частиц,
+    загруженных из каждого файла, и список заголовков файлов
+    (для TSV - None).
+
+    """
+
+    if isinstance(files, str):
+        files = [files]
+
+    if particles is None:
+        particles = shapes.ParticleSet(dim=2)
+
+    three_d = particles.dim == 3 and len(particles) > 0
+    counts = []
+    headers = []
+    for file in files:
+        count = 0
+        for rows in read(file, block_size):
+            three_d = three_d or bool(np.any(rows[:, 2]))
+            particles.extend(rows)
+            count += len(rows)
+        counts.append(count)
+        headers.append(open_npz(file)[1] if is_binary(file) else None)
+
+    particles.dim = 3 if three_d else 2
+
+    return particles, counts, headers
+
+
+def save_tsv(file, particles):
+    """Сохранить частицы (ParticleSet) в файл TSV (x, y, z, d)."""
+
+    np.savetxt(file, particles.array(), delimiter='\t')
+
+
+def save_npz(file, particles, header=None):
+    """
+    Сохранить частицы (ParticleSet) в двоичный файл .npz (без сжатия)
+    с заголовком header (словарь, см. metadata).
+
+    """
+
+    header = dict(header or {'format': FORMAT, 'version': VERSION})
+    header['particles'] = len(particles)
+
+    np.savez(file, particles=np.ascontiguousarray(particles.array()),
+             metadata=np.array(json.dumps(header, ensure_ascii=False)))
+
+
+def save(file, particles, header=None):
+    """Сохранить частицы в файл: .npz - двоичный, иначе TSV."""
+
+    if is_binary(file):
+        save_npz(file, particles, header)
+    else:
+        save_tsv(file, particles)
+
+
+if __name__ == '__main__':
+
+    import tempfile
+
+    rng = np.random.default_rng(1)
+    n = 1000
+    ps = shapes.ParticleSet.from_array(np.column_stack((
+        rng.random((n, 3)) * 100., rng.random(n) + 1.)))
+
+    name = os.path.join(tempfile.gettempdir(), 'particles.tsv')
+    save_tsv(name, ps)
+
+    loaded, sizes, _ = load([name, name])
+    print(loaded, sizes)
+    print(np.array_equal(loaded.array()[:n], ps.array()))
+
+    binary = os.path.join(tempfile.gettempdir(), 'particles.npz')
+    save(binary, ps, metadata({'dim_ind': 1, 'matrix': 100.}, entropy=1))
+
+    array, head = open_npz(binary)
+    print(type(array).__name__, array.shape, head)
+    print(np.array_equal(array, ps.array()))
+
+    del array
+    os.remove(name)
+    os.remove(binary)
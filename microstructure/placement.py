@@ -0,0 +1,545 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль размещения частиц в матрице (без графического интерфейса)
+"""
+
+import threading
+import time
+import numpy as np
+import shapes
+import fill_deg
+import grid
+import free_space
+
+
+class Report:
+    """Отчёт о результатах размещения частиц."""
+
+    def __init__(self):
+        self.initial = 0  # кол-во имевшихся (загруженных) частиц
+        self.diameters = {}  # номер фракции: диаметр частиц
+        self.added = {}  # номер фракции: кол-во добавленных частиц
+        self.fails = {}  # номер фракции: кол-во неразмещённых частиц
+        self.filling = {}  # номер фракции: достигнутая степень заполнения
+        self.attempts = 0  # общее кол-во попыток
+        self.rejected = {'boundary': 0, 'overlap': 0}  # причина: кол-во
+        self.stopped = False  # расчёт остановлен
+        self.elapsed = 0.  # время расчёта, с
+
+    def __str__(self):
+        text = 'report: initial={0}, added={1}, attempts={2}, '\
+            'elapsed={3:.3f}'.format(
+                self.initial, sum(self.added.values()), self.attempts,
+                self.elapsed)
+
+        for fraction in sorted(self.added):
+            text += '\nfraction {0}, d={1:.1f}: added={2}, fails={3}'.format(
+                fraction, self.diameters[fraction], self.added[fraction],
+                self.fails.get(fraction, 0))
+            if fraction in self.filling:
+                text += ', KV={0:.3f}'.format(self.filling[fraction])
+
+        text += '\nrejected: boundary={0}, overlap={1}'.format(
+            self.rejected['boundary'], self.rejected['overlap'])
+
+        if self.stopped:
+            text += '\nstopped'
+
+        return text
+
+
+class CancelToken:
+    """
+    Признак отмены расчёта, безопасный для использования из разных потоков.
+
+    Экземпляр передаётся в generate в качестве stop: вызов token()
+    возвращает True после вызова token.cancel().
+
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def __call__(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """Отменить расчёт."""
+
+        self._event.set()
+
+    def cancelled(self):
+        """Отменён ли расчёт."""
+
+        return self._event.is_set()
+
+
+def check_boundary(options, particle):
+    """
+    Проверить близость границ частицы и матрицы.
+
+    расстояния от центра частицы:
+    distance - ... до ближайшей границы матрицы по данной координате;
+    cross - ... "внутрь";
+    gap - ... "наружу";
+
+    """
+
+    edge = options['matrix']
+    middle = edge / 2
+    repulsion = options['boundary_repulsion'] / 100 * particle.r
+    cross = particle.r - repulsion
+    gap = particle.r + repulsion
+
+    # недопустимо близко к границе матрицы (хотя бы по одной координате)
+    x = particle.x
+    distance = x if x < middle else edge - x
+    if cross < distance < gap:
+        return True
+
+    y = particle.y
+    distance = y if y < middle else edge - y
+    if cross < distance < gap:
+        return True
+
+    if particle.dim == 3:
+        z = particle.z
+        distance = z if z < middle else edge - z
+        if cross < distance < gap:
+            return True
+
+    return False
+
+
+def random_centres(options, diameter, size, rng=np.random):
+    """
+    Пакет случайных центров частиц (массив size x dim).
+
+    Распределение совпадает с shapes.Point2D/Point3D.randomize_*.
+    rng - генератор случайных чисел (np.random.Generator).
+
+    """
+
+    sample = rng.random((size, options['dim_ind'] + 2))
+
+    if options['var_ind'] == 0:
+        # частицы целиком находятся в матрице
+        return (options['matrix'] - 4 * diameter) * sample + 2 * diameter
+
+    # центры частиц находятся в матрице (либо границы периодичны)
+    return options['matrix'] * sample
+
+
+def admissible(options, centres, diameter):
+    """
+    Маска центров пакета, прошедших проверки границ матрицы.
+
+    Векторный аналог check_boundary (граничное отталкивание). Частица
+    может пересекать несколько граней матрицы (её часть внутри матрицы
+    рассчитывается точно, см. fill_deg.spaces). При периодических
+    границах проверки не выполняются.
+
+    """
+
+    if options['var_ind'] == 2:  # периодические границы
+        return np.ones(len(centres), dtype=bool)
+
+    radius = diameter / 2
+    repulsion = options['boundary_repulsion'] / 100 * radius
+
+    distance = np.minimum(centres, options['matrix'] - centres)
+    boundary = np.any(
+        (radius - repulsion < distance) & (distance < radius + repulsion),
+        axis=1)
+
+    return ~boundary
+
+
+def make_particle(options, centre, diameter):
+    """Частица по координатам центра."""
+
+    if options['dim_ind'] == 0:  # 2D
+        return shapes.Circle(centre[0], centre[1], diameter)
+
+    return shapes.Sphere(centre[0], centre[1], centre[2], diameter)
+
+
+def candidates(options, diameter, rng=np.random):
+    """
+    Кандидаты в центры частиц и маска прошедших проверки границ.
+
+    При options['batch_size'] > 1 кандидаты генерируются и проверяются
+    пакетом, иначе - по одному через объекты модуля shapes.
+
+    """
+
+    if options['batch_size'] > 1:
+        centres = random_centres(
+            options, diameter, options['batch_size'], rng)
+        return centres, admissible(options, centres, diameter)
+
+    if options['dim_ind'] == 0:  # 2D
+        point = shapes.Point2D()
+    elif options['dim_ind'] == 1:  # 3D
+        point = shapes.Point3D()
+
+    if options['var_ind'] == 0:
+        # частицы целиком находятся в матрице
+        point.randomize_particles_inside(options['matrix'], diameter, rng)
+    elif options['var_ind'] in (1, 2):
+        # центры частиц находятся в матрице (либо границы периодичны)
+        point.randomize_centers_inside(options['matrix'], rng)
+
+    if options['dim_ind'] == 0:  # 2D
+        centre = (point.x, point.y)
+    elif options['dim_ind'] == 1:  # 3D
+        centre = (point.x, point.y, point.z)
+
+    particle = make_particle(options, centre, diameter)
+
+    valid = options['var_ind'] == 2 or not check_boundary(options, particle)
+
+    return np.array([centre]), np.array([valid])
+
+
+def matrix(options):
+    """Матрица (квадрат либо куб)."""
+
+    if options['dim_ind'] == 0:  # 2D
+        return shapes.SquareMatrix(options['matrix'])
+
+    return shapes.CubeMatrix(options['matrix'])
+
+
+def spatial_index(options, particles):
+    """Пространственный индекс уже размещённых частиц (ParticleSet)."""
+
+    index = grid.UniformGrid(
+        cell_size=grid.cell_size(options, particles.d),
+        dim=options['dim_ind'] + 2,
+        period=options['matrix'] if options['var_ind'] == 2 else None)
+    index.extend(particles.points(), particles.d)
+
+    return index
+
+
+def new_seed():
+    """
+    Новое случайное зерно расчёта (целое число; записывается в заголовок
+    файла распределения для повторения расчёта).
+
+    """
+
+    return np.random.SeedSequence().entropy
+
+
+def silent(event, **info):
+    """Обработчик событий по умолчанию (ничего не делает)."""
+
+
+def never_stop():
+    """Признак остановки по умолчанию (расчёт не останавливается)."""
+
+    return False
+
+
+class Placement:
+    """Размещение частиц фракций в матрице с уже имеющимися частицами."""
+
+    def __init__(self, options, particles, notify, stop, rng=None):
+        self.options = options
+        self.particles = particles  # все частицы (ParticleSet)
+        self.index = spatial_index(options, particles)
+        self.notify = notify
+        self.stop = stop
+        self.rng = np.random.default_rng(rng)  # генератор случайных чисел
+        self.matrix = matrix(options)
+        self.occupied = {}  # номер фракции: площадь либо объём добавленных
+        self.full = {}  # диаметр: площадь либо объём целой частицы
+        self.space = None  # карта свободного пространства текущей фракции
+
+        self.report = Report()
+        self.report.initial = len(particles)
+
+    def start_fraction(self, fraction, diameter):
+        """Подготовка к размещению частиц фракции."""
+
+        self.report.diameters[fraction] = diameter
+        self.report.added.setdefault(fraction, 0)
+        self.report.filling.setdefault(fraction, 0)
+        self.occupied.setdefault(fraction, 0.)
+        if self.particles.dim == 3:
+            self.full[diameter] = np.pi * diameter ** 3 / 6
+        else:
+            self.full[diameter] = np.pi * diameter ** 2 / 4
+
+        if self.options['sampling_ind'] == 1:  # свободное пространство
+            self.space = free_space.FreeSpace(
+                self.options, diameter, self.index, rng=self.rng)
+        else:
+            self.space = None
+
+    def candidates(self, diameter):
+        """Кандидаты в центры частиц и маска прошедших проверки границ."""
+
+        if self.space is None:
+            return candidates(self.options, diameter, self.rng)
+
+        centres = self.space.sample(self.options['batch_size'])
+
+        return centres, admissible(self.options, centres, diameter)
+
+    def saturated(self):
+        """Свободного пространства для центров частиц фракции не осталось."""
+
+        return self.space is not None and self.space.saturated()
+
+    def feedback(self, added, attempts):
+        """Передать карте свободного пространства результат пакета."""
+
+        if self.space is not None:
+            self.space.feedback(added, attempts)
+
+    def obstacles(self, centres, valid, diameter):
+        """
+        Мешающие частицы индекса для кандидатов пакета (-1 - нет),
+        прошедших проверки границ; проверка - одной операцией над
+        массивами (grid.UniformGrid.overlap_batch).
+
+        """
+
+        result = np.full(len(centres), -1, dtype=np.int64)
+
+        if self.options['batch_size'] <= 1:
+            # по одному кандидату: упорядочение индекса по ячейкам
+            # перед каждой проверкой не окупается
+            for i in np.flatnonzero(valid):
+                obstacle = self.index.overlap(
+                    centres[i], diameter, self.options['gap'])
+                if obstacle is not None:
+                    result[i] = obstacle
+            return result
+
+        result[valid] = self.index.overlap_batch(
+            centres[valid], diameter, self.options['gap'])
+
+        return result
+
+    def test(self, centre, ok, diameter, obstacle, first):
+        """
+        Проверка кандидата, прошедшего (ok) либо нет проверки границ.
+
+        obstacle - мешающая частица по проверке пакета (-1 - нет), first -
+        кол-во частиц индекса на момент проверки пакета: частицы,
+        добавленные позже (из того же пакета), проверяются здесь.
+
+        """
+
+        self.report.attempts += 1
+
+        if not ok:
+            self.report.rejected['boundary'] += 1
+            return False
+
+        if obstacle < 0:
+            obstacle = self.index.overlap_since(
+                first, centre, diameter, self.options['gap'])
+        if obstacle >= 0:
+            self.report.rejected['overlap'] += 1
+            self.notify('overlap', particle=self.index.points[obstacle],
+                        diameter=self.index.diameters[obstacle])
+            return False
+
+        return True
+
+    def particle_space(self, centre, diameter):
+        """
+        Площадь либо объём части частицы в матрице (при периодических
+        границах выступающие части учитываются у противоположных граней).
+
+        """
+
+        radius = diameter / 2
+        if self.options['var_ind'] == 2 or\
+                all(radius <= c <= self.options['matrix'] - radius
+                    for c in centre):
+            return self.full[diameter]  # частица целиком в матрице
+
+        return float(fill_deg.spaces(self.matrix, [centre], [diameter])[0])
+
+    def accept(self, centre, diameter, fraction):
+        """Добавить частицу (с учётом в степени заполнения фракции)."""
+
+        self.index.insert(centre, diameter)
+        self.particles.add(centre[0], centre[1],
+                           centre[2] if len(centre) == 3 else 0.,
+                           diameter, fraction)
+        self.report.added[fraction] += 1
+        self.occupied[fraction] += self.particle_space(centre, diameter)
+        self.report.filling[fraction] = fill_deg.filling(
+            self.matrix, self.occupied[fraction])
+        self.notify('added', centre=centre, diameter=diameter)
+
+        if self.space is not None:
+            self.space.mark(centre, diameter)
+
+    def number(self, fraction, diameter, remain):
+        """Разместить заданное кол-во частиц одного диаметра."""
+
+        current_iteration = 1
+        # кол-во попыток подобрать координаты текущей частицы
+
+        while remain > 0 and not self.stop():
+            if self.saturated():
+                self.report.fails[fraction] =\
+                    self.report.fails.get(fraction, 0) + remain
+                self.notify('failed', diameter=diameter)
+                break
+
+            centres, valid = self.candidates(diameter)
+            self.notify('batch', diameter=diameter, centres=centres,
+                        iteration=current_iteration, remain=remain)
+            if self.stop():
+                break
+
+            added = self.report.added[fraction]
+            attempts = self.report.attempts
+            first = len(self.index)
+            obstacles = self.obstacles(centres, valid, diameter)
+            for centre, ok, obstacle in zip(centres, valid, obstacles):
+                if self.test(centre, ok, diameter, obstacle, first):
+                    self.accept(centre, diameter, fraction)
+                else:
+                    current_iteration += 1
+                    if current_iteration < self.options['max_iter']:
+                        continue
+                    self.report.fails[fraction] =\
+                        self.report.fails.get(fraction, 0) + 1
+                    self.notify('failed', diameter=diameter)
+
+                remain -= 1
+                current_iteration = 1
+                if remain == 0:
+                    break
+
+            self.feedback(self.report.added[fraction] - added,
+                          self.report.attempts - attempts)
+
+    def filling(self, fraction, diameter, max_filling):
+        """Разместить частицы одного диаметра до заданного заполнения."""
+
+        current_filling = self.report.filling[fraction]
+        current_iteration = 1
+        # кол-во попыток подобрать распределение частиц в матрице
+
+        while current_filling < max_filling and\
+                current_iteration < self.options['max_iter'] and\
+                not self.stop() and not self.saturated():
+            centres, valid = self.candidates(diameter)
+            self.notify('batch', diameter=diameter, centres=centres,
+                        iteration=current_iteration, filling=current_filling)
+            if self.stop():
+                break
+
+            added = self.report.added[fraction]
+            attempts = self.report.attempts
+            first = len(self.index)
+            obstacles = self.obstacles(centres, valid, diameter)
+            for centre, ok, obstacle in zip(centres, valid, obstacles):
+                if self.test(centre, ok, diameter, obstacle, first):
+                    self.accept(centre, diameter, fraction)
+                    current_filling = self.report.filling[fraction]
+                    if current_filling >= max_filling:
+                        break
+                else:
+                    current_iteration += 1
+                    if current_iteration >= self.options['max_iter']:
+                        break
+
+            self.feedback(self.report.added[fraction] - added,
+                          self.report.attempts - attempts)
+
+    def run(self):
+        """Разместить частицы всех фракций."""
+
+        start = time.perf_counter()
+
+        for fraction, (diameter, definition) in enumerate(
+                self.options['fractions_definition']):
+            if diameter == 0:
+                continue
+            if self.stop():
+                break
+
+            self.start_fraction(fraction, diameter)
+
+            if self.options['def_ind'] == 0:  # кол-во частиц
+                self.number(fraction, diameter, int(definition))
+            elif self.options['def_ind'] == 1:  # степень заполнения
+                self.filling(fraction, diameter, definition)
+
+        self.report.stopped = self.stop()
+        self.report.elapsed = time.perf_counter() - start
+
+        return self.particles, self.report
+
+
+def generate(options, particles=None, listener=None, stop=None, rng=None):
+    """
+    Создать случайное распределение частиц.
+
+    options - параметры расчёта (ключи как в Application.options);
+    particles - уже имеющиеся частицы: ParticleSet либо массив строк
+    (x, y, z, d), не изменяются;
+    listener - обработчик событий расчёта listener(event, **info);
+    stop - функция без аргументов, возвращающая True для остановки;
+    rng - генератор случайных чисел np.random.Generator либо зерно
+    (целое число, np.random.SeedSequence); при одинаковом зерне
+    результат повторяется.
+    При options['def_ind'] == 2 расчёт выполняется методом уплотнения
+    (densification.generate).
+
+    Возвращает набор всех частиц ParticleSet (имеющиеся, затем
+    добавленные, fraction - номер фракции) и отчёт о расчёте.
+
+    """
+
+    if options['def_ind'] == 2:  # уплотнение (Любачевский-Стиллинджер)
+        import densification
+        return densification.generate(
+            options, particles, listener, stop, rng=rng)
+
+    dim = options['dim_ind'] + 2
+
+    if particles is None:
+        particles = shapes.ParticleSet(dim=dim)
+    elif isinstance(particles, shapes.ParticleSet):
+        particles = particles.copy()
+    else:
+        particles = shapes.ParticleSet.from_array(particles, dim=dim)
+    particles.dim = dim
+
+    return Placement(options, particles, listener or silent,
+                     stop or never_stop, rng).run()
+
+
+if __name__ == '__main__':
+
+    opt = {
+        'dim_ind': 1,
+        'var_ind': 1,
+        'def_ind': 1,
+        'matrix': 100.,
+        'gap': 1.,
+        'boundary_repulsion': 20,
+        'max_iter': 1000,
+        'batch_size': 256,
+        'sampling_ind': 0,
+        'fractions_definition': [[20., 0.2], [10., 0.05]],
+    }
+
+    ps, rep = generate(opt)
+    print(ps)
+    print(rep)
@@ -20,6 +20,7 @@ class EditRegularDistributionOptions(QtWidgets.QDialog):
         self.all_particles = all_particles
         self.regular_particles = regular_particles
         self.save_all_to_file = save_all_to_file
+        self.seed = None  # зерно смещений узлов
         self.clean_distributions = clean_distributions
 
         self.resize(500, 300)
@@ -37,7 +38,7 @@ class EditRegularDistributionOptions(QtWidgets.QDialog):
             self.table_widget.setHorizontalHeaderLabels(["x", "y"])
 
         self.table_widget.setVerticalHeaderLabels(
-            ["Начало отсчёта", "Приращение", "Количество"])
+            ["Начало отсчёта", "Ребро ячейки", "Количество ячеек"])
         self.table_widget.cellChanged.connect(self.changed)
 
         # заполнение массива
@@ -60,8 +61,29 @@ class EditRegularDistributionOptions(QtWidgets.QDialog):
         self.radius.setDecimals(1)
         self.radius.editingFinished.connect(number_save)
 
+        def lattice_save(index):
+            self.options['lattice_ind'] = index
+
+        self.lattice = QtWidgets.QComboBox()
+        for name in self.options['lattice_tup']:
+            self.lattice.addItem(name)
+        self.lattice.setCurrentIndex(self.options['lattice_ind'])
+        self.lattice.currentIndexChanged.connect(lattice_save)
+
+        def jitter_save():
+            self.options['jitter'] = self.jitter.value()
+
+        self.jitter = QtWidgets.QDoubleSpinBox()
+        self.jitter.setRange(0, 1)
+        self.jitter.setValue(self.options['jitter'])
+        self.jitter.setSingleStep(0.1)
+        self.jitter.setDecimals(2)
+        self.jitter.editingFinished.connect(jitter_save)
+
         self.form = QtWidgets.QFormLayout()
         self.form.addRow("&Диаметр", self.radius)
+        self.form.addRow("&Решётка", self.lattice)
+        self.form.addRow("&Смещение узлов (доля зазора / 2)", self.jitter)
 
         self.button_save = QtWidgets.QPushButton("Сохранить в файл")
         self.button_save.clicked.connect(self.save_file)
@@ -82,48 +104,36 @@ class EditRegularDistributionOptions(QtWidgets.QDialog):
     def calc_regular_distribution(self):
         """Calculation regular distribution."""
 
-        import shapes
-
-        self.regular_particles = []  # очистка
-
-        x0 = self.options['regular_distribution'][0][0]
-        dx = self.options['regular_distribution'][1][0]
-        nx = self.options['regular_distribution'][2][0]
-
-        y0 = self.options['regular_distribution'][0][1]
-        dy = self.options['regular_distribution'][1][1]
-        ny = self.options['regular_distribution'][2][1]
-
-        if self.options['dim_ind'] == 1:  # 3D
-            z0 = self.options['regular_distribution'][0][2]
-            dz = self.options['regular_distribution'][1][2]
-            nz = self.options['regular_distribution'][2][2]
-
-        for x in [x0 + dx * i for i in range(nx)]:
-            for y in [y0 + dy * i for i in range(ny)]:
-                if self.options['dim_ind'] == 1:  # 3D
-                    for z in [z0 + dz * i for i in range(nz)]:
-                        particle = shapes.Sphere(
-                            x, y, z,
-                            self.options['regular_distribution_diameter'])
-                        self.regular_particles.append(particle)
-                else:  # 2D
-                    # z = 0
-                    particle = shapes.Circle(
-                        x, y, self.options['regular_distribution_diameter'])
-                    self.regular_particles.append(particle)
+        import lattice
+        import placement
+
+        self.regular_particles.clear()  # очистка
+        self.regular_particles.dim = self.options['dim_ind'] + 2
+
+        # узлы решётки: начало отсчёта, рёбра ячейки, количество ячеек
+        self.seed = placement.new_seed()
+        self.regular_particles.extend(lattice.generate(self.options,
+                                                       self.seed))
 
         self.all_particles.extend(
             self.regular_particles)  # расширить список всех частиц
+        self.all_particles.dim = self.regular_particles.dim
+        # размерность могла измениться после создания набора
 
         self.button_save.setEnabled(True)
         self.clean_distributions.setEnabled(True)
 
         self.message('Регулярное распределение частиц посчитано')
 
+        import audit
+
+        report = audit.audit(self.options, self.all_particles)
+        for line in audit.describe(report, self.all_particles):
+            self.message(line)
+
     def save_file(self):
 
-        self.save_all_to_file(self.regular_particles)
+        self.save_all_to_file(self.regular_particles, self.seed)
         self.close()
 
     def changed(self):
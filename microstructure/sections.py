@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль сечений 3D-распределений частиц плоскостями
+"""
+
+import numpy as np
+import fill_deg
+import shapes
+
+AXES = {'x': 0, 'y': 1, 'z': 2}
+
+# оси плоскости сечения (абсцисса, ордината) - как на видах модуля visu
+PLANE_AXES = {0: (1, 2), 1: (2, 0), 2: (0, 1)}
+
+
+class Section:
+    """
+    Сечение распределения шаров плоскостью axis = offset.
+
+    particles - круги сечения (ParticleSet 2D в осях плоскости
+    PLANE_AXES[axis]), indices - номера рассечённых шаров, area -
+    площадь кругов в матрице, fraction - доля площади сечения матрицы.
+
+    """
+
+    def __init__(self, axis, offset, particles, indices, area, fraction):
+        self.axis = axis
+        self.offset = offset
+        self.particles = particles
+        self.indices = indices
+        self.area = area
+        self.fraction = fraction
+
+    def __str__(self):
+        return 'section: {0}={1:g}, circles={2}, fraction={3:.4f}'.format(
+            'xyz'[self.axis], self.offset, len(self.indices), self.fraction)
+
+
+def _axis(axis):
+    """Номер оси (0, 1, 2 либо 'x', 'y', 'z')."""
+
+    return AXES[axis] if isinstance(axis, str) else int(axis)
+
+
+def cut(particles, planes, matrix_edge, periodic=False):
+    """
+    Рассечь шары (ParticleSet либо массив строк x, y, z, d) плоскостями
+    planes - последовательностью пар (ось, смещение). Возвращает список
+    сечений Section в порядке planes.
+
+    Центры шаров сортируются по каждой оси один раз, рассечённые
+    плоскостью шары находятся двоичным поиском в полосе шириной
+    наибольшего диаметра около плоскости. Площади кругов, пересекающих
+    границы матрицы, вычисляются точно (fill_deg.spaces); при periodic
+    учитываются периодические образы шаров.
+
+    """
+
+    if isinstance(particles, shapes.ParticleSet):
+        particles = particles.array()
+    points = np.ascontiguousarray(particles[:, :3])
+    radii = particles[:, 3] / 2
+
+    matrix = shapes.SquareMatrix(edge=matrix_edge)
+    r_max = radii.max() if len(radii) else 0.
+
+    orders = {}  # порядок сортировки и отсортированные координаты по осям
+    sections = []
+    for axis, offset in planes:
+        axis = _axis(axis)
+        if axis not in orders:
+            order = np.argsort(points[:, axis], kind='stable')
+            orders[axis] = order, points[order, axis]
+        order, coordinates = orders[axis]
+
+        # полосы около плоскости (при periodic - и около её образов)
+        shifts = (-matrix_edge, 0., matrix_edge) if periodic else (0.,)
+        candidates = []
+        for shift in shifts:
+            low, high = np.searchsorted(
+                coordinates, (offset + shift - r_max, offset + shift + r_max))
+            candidates.append(order[low:high])
+        candidates = np.unique(np.concatenate(candidates))
+
+        distance = points[candidates, axis] - offset
+        if periodic:
+            distance -= matrix_edge * np.round(distance / matrix_edge)
+        squared = radii[candidates] ** 2 - distance ** 2
+        cut_mask = squared > 0
+        indices = candidates[cut_mask]
+        diameters = 2 * np.sqrt(squared[cut_mask])
+
+        centres = points[np.ix_(indices, PLANE_AXES[axis])]
+        array = np.zeros((len(indices), 4))
+        array[:, :2] = centres
+        array[:, 3] = diameters
+        circles = shapes.ParticleSet.from_array(array, dim=2)
+
+        area = float(np.sum(fill_deg.spaces(
+            matrix, centres, diameters, periodic=periodic))) \
+            if len(indices) else 0.
+
+        sections.append(Section(axis, offset, circles, indices, area,
+                                area / matrix_edge ** 2))
+
+    return sections
+
+
+def profile(particles, axis, number, matrix_edge, periodic=False):
+    """
+    Доли площади number равноотстоящих сечений матрицы плоскостями,
+    перпендикулярными оси axis. Возвращает массивы смещений и долей.
+
+    Среднее долей площади сечений оценивает объёмную долю частиц
+    (принцип Делесса).
+
+    """
+
+    offsets = (np.arange(number) + 0.5) * matrix_edge / number
+    sections = cut(particles, [(axis, offset) for offset in offsets],
+                   matrix_edge, periodic)
+
+    return offsets, np.array([section.fraction for section in sections])
+
+
+if __name__ == '__main__':
+
+    ps = shapes.ParticleSet(dim=3)
+    ps.add(50., 50., 50., 20.)
+    ps.add(10., 95., 55., 20.)
+    for s in cut(ps, [('z', 50.), ('x', 10.), ('y', 100.)], 100.):
+        print(s, s.particles.array())
+
+    n = 1000
+    rng = np.random.default_rng(1)
+    array = np.column_stack((rng.random((n, 3)) * 100.,
+                             rng.random(n) * 5. + 5.))
+
+    offs, fracs = profile(array, 'z', 50, 100., periodic=True)
+    print('area fraction={0:.4f}, volume fraction={1:.4f}'.format(
+        fracs.mean(), np.sum(np.pi / 6 * array[:, 3] ** 3) / 100. ** 3))
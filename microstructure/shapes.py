@@ -5,6 +5,7 @@
 Модуль определения форм геометрических объектов
 """
 
+import itertools
 import numpy as np
 
 
@@ -40,6 +41,10 @@ class CubeMatrix(SquareMatrix):
 class Point2D(object):
     """Координаты центра частицы (2D)."""
 
+    __slots__ = 'x', 'y'
+
+    dim = 2  # размерность
+
     def __init__(self, x=0., y=0.):
         self.x = x
         self.y = y
@@ -47,20 +52,26 @@ class Point2D(object):
     def __str__(self):
         return 'point2d: x={0:.3f}, y={1:.3f}'.format(self.x, self.y)
 
-    def randomize_centers_inside(self, interval):
-        self.x = interval * np.random.random_sample()
-        self.y = interval * np.random.random_sample()
+    def randomize_centers_inside(self, interval, rng=np.random):
+        """rng - генератор случайных чисел (np.random.Generator)."""
+
+        self.x = interval * rng.random()
+        self.y = interval * rng.random()
 
-    def randomize_particles_inside(self, interval, radius):
-        self.x = (interval - 4 * radius) * np.random.random_sample() +\
-            2 * radius
-        self.y = (interval - 4 * radius) * np.random.random_sample() +\
-            2 * radius
+    def randomize_particles_inside(self, interval, radius, rng=np.random):
+        """rng - генератор случайных чисел (np.random.Generator)."""
+
+        self.x = (interval - 4 * radius) * rng.random() + 2 * radius
+        self.y = (interval - 4 * radius) * rng.random() + 2 * radius
 
 
 class Point3D(Point2D):
     """Координаты центра частицы (3D)."""
 
+    __slots__ = 'z',
+
+    dim = 3  # размерность
+
     def __init__(self, x=0., y=0., z=0.):
         super().__init__(x, y)
         self.z = z
@@ -69,70 +80,301 @@ class Point3D(Point2D):
         return 'point3d: x={0:.3f}, y={1:.3f}, z={2:.3f}'.format(
             self.x, self.y, self.z)
 
-    def randomize_centers_inside(self, interval):
-        super().randomize_centers_inside(interval)
-        self.z = interval * np.random.random_sample()
+    def randomize_centers_inside(self, interval, rng=np.random):
+        super().randomize_centers_inside(interval, rng)
+        self.z = interval * rng.random()
 
-    def randomize_particles_inside(self, interval, radius):
-        super().randomize_particles_inside(interval, radius)
-        self.z = (interval - 4 * radius) * np.random.random_sample() +\
-            2 * radius
+    def randomize_particles_inside(self, interval, radius, rng=np.random):
+        super().randomize_particles_inside(interval, radius, rng)
+        self.z = (interval - 4 * radius) * rng.random() + 2 * radius
 
 
 class Circle(Point2D):
     """Частица в форме круга."""
 
+    __slots__ = '_d', 'r'
+
     def __init__(self, x=0., y=0., d=2.):
         super().__init__(x, y)
         self.d = d
 
+    @property
+    def d(self):
+        """Диаметр (радиус r пересчитывается при изменении)."""
+
+        return self._d
+
+    @d.setter
+    def d(self, value):
+        self._d = value
+        self.r = value / 2
+
     def __str__(self):
         return 'circle: x={0:.3f}, y={1:.3f}, d={2:.3f}'.format(
             self.x, self.y, self.d)
 
     def space(self):
-        return np.pi * (self.d / 2) ** 2
+        return np.pi * self.r ** 2
 
     def crossing(self, matrix_edge):
         """Проверка пересечения границ матрицы"""
 
-        number = 0
+        r = self.r
 
-        for i in self.x, self.y:
-            if i + self.d / 2 > matrix_edge:
-                number += 1
-            elif i - self.d / 2 < 0:
-                number += 1
-
-        return number
+        return ((self.x + r > matrix_edge or self.x - r < 0) +
+                (self.y + r > matrix_edge or self.y - r < 0))
 
 
 class Sphere(Point3D):
     """Частица в форме шара."""
 
+    __slots__ = '_d', 'r'
+
     def __init__(self, x=0., y=0., z=0., d=2.):
         super().__init__(x, y, z)
         self.d = d
 
+    d = Circle.d
+
     def __str__(self):
         return 'sphere: x={0:.3f}, y={1:.3f}, z={2:.3f}, d={3:.3f}'.format(
             self.x, self.y, self.z, self.d)
 
     def space(self):
-        return 4 / 3 * np.pi * (self.d / 2) ** 3
+        return 4 / 3 * np.pi * self.r ** 3
 
     def crossing(self, matrix_edge):
         """Проверка пересечения границ матрицы"""
 
-        number = 0
+        r = self.r
+
+        return ((self.x + r > matrix_edge or self.x - r < 0) +
+                (self.y + r > matrix_edge or self.y - r < 0) +
+                (self.z + r > matrix_edge or self.z - r < 0))
+
+
+class ParticleSet:
+    """
+    Набор частиц в виде структуры массивов (x, y, z, d, fraction).
+
+    Поля хранятся строками общего массива с запасом ёмкости, поэтому
+    добавление частицы выполняется за амортизированное O(1). Срезы набора
+    являются представлениями (без копирования данных); при добавлении
+    частиц в представление его данные копируются. Для 2D-задачи z = 0.
+    fraction - номер фракции в options['fractions_definition'] либо -1
+    (загруженные и регулярно распределённые частицы).
+
+    """
+
+    FIELDS = 'x', 'y', 'z', 'd'
+
+    def __init__(self, dim=3, capacity=16):
+        self.dim = dim  # размерность задачи (2 либо 3)
+        self.size = 0
+        self._data = np.zeros((len(self.FIELDS), capacity))
+        self._fraction = np.full(capacity, -1, dtype=np.int32)
+
+    def __str__(self):
+        return 'particle set: dim={0}, size={1}, capacity={2}'.format(
+            self.dim, self.size, self._data.shape[1])
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self.particle(i)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += self.size
+            if not 0 <= key < self.size:
+                raise IndexError('Индекс частицы вне набора!')
+            return self.particle(key)
+
+        view = ParticleSet.__new__(ParticleSet)
+        view.dim = self.dim
+        view._data = self._data[:, :self.size][:, key]
+        view._fraction = self._fraction[:self.size][key]
+        view.size = view._data.shape[1]
+
+        return view
+
+    @property
+    def x(self):
+        return self._data[0, :self.size]
+
+    @property
+    def y(self):
+        return self._data[1, :self.size]
+
+    @property
+    def z(self):
+        return self._data[2, :self.size]
+
+    @property
+    def d(self):
+        return self._data[3, :self.size]
+
+    @property
+    def fraction(self):
+        return self._fraction[:self.size]
+
+    @classmethod
+    def from_array(cls, array, dim=None, fraction=-1):
+        """
+        Набор частиц по массиву строк (x, y, z, d).
+
+        При dim=None размерность определяется по столбцу z
+        (хотя бы один z != 0 - 3D).
+
+        """
+
+        array = np.asarray(array, dtype=np.float64).reshape(-1, 4)
+
+        if dim is None:
+            dim = 3 if np.any(array[:, 2]) else 2
+
+        particles = cls(dim=dim, capacity=max(len(array), 16))
+        particles.extend(array, fraction)
 
-        for i in self.x, self.y, self.z:
-            if i + self.d / 2 > matrix_edge:
-                number += 1
-            elif i - self.d / 2 < 0:
-                number += 1
+        return particles
 
-        return number
+    def _reserve(self, count):
+        """Обеспечить ёмкость для добавления count частиц."""
+
+        capacity = self._data.shape[1]
+        if self.size + count <= capacity and self._data.base is None:
+            return
+
+        capacity = max(2 * capacity, self.size + count, 16)
+
+        data = np.zeros((len(self.FIELDS), capacity))
+        data[:, :self.size] = self._data[:, :self.size]
+        self._data = data
+
+        fraction = np.full(capacity, -1, dtype=np.int32)
+        fraction[:self.size] = self._fraction[:self.size]
+        self._fraction = fraction
+
+    def add(self, x, y, z, d, fraction=-1):
+        """Добавить частицу по координатам центра и диаметру."""
+
+        self._reserve(1)
+        self._data[:, self.size] = x, y, z, d
+        self._fraction[self.size] = fraction
+        self.size += 1
+
+    def append(self, particle, fraction=-1):
+        """Добавить частицу (Circle либо Sphere)."""
+
+        self.add(particle.x, particle.y, getattr(particle, 'z', 0.),
+                 particle.d, fraction)
+
+    def extend(self, particles, fraction=-1):
+        """
+        Добавить частицы: другой набор, массив строк (x, y, z, d)
+        либо последовательность объектов Circle/Sphere.
+
+        """
+
+        if isinstance(particles, ParticleSet):
+            array = particles.array()
+            fraction = particles.fraction
+        elif isinstance(particles, np.ndarray):
+            array = particles.reshape(-1, 4)
+        else:
+            array = np.array(
+                [(i.x, i.y, getattr(i, 'z', 0.), i.d) for i in particles],
+                dtype=np.float64).reshape(-1, 4)
+
+        count = len(array)
+        self._reserve(count)
+        self._data[:, self.size:self.size + count] = array.T
+        self._fraction[self.size:self.size + count] = fraction
+        self.size += count
+
+    def particle(self, i):
+        """Частица с номером i (Circle либо Sphere)."""
+
+        x, y, z, d = self._data[:, i]
+
+        if self.dim == 2:
+            return Circle(x, y, d)
+
+        return Sphere(x, y, z, d)
+
+    def array(self):
+        """Представление набора в виде массива строк (x, y, z, d)."""
+
+        return self._data[:, :self.size].T
+
+    def points(self):
+        """Представление координат центров (массив size x dim)."""
+
+        return self._data[:self.dim, :self.size].T
+
+    def copy(self):
+        """Копия набора."""
+
+        particles = ParticleSet(dim=self.dim, capacity=max(self.size, 16))
+        particles.extend(self)
+
+        return particles
+
+    def clear(self):
+        """Удалить все частицы (ёмкость сохраняется)."""
+
+        self.size = 0
+
+
+def particle_array(particles, dim=None):
+    """
+    Массив строк x, y, z, d и размерность по набору ParticleSet, массиву
+    строк (размерность dim, по умолчанию 3) либо последовательности
+    объектов Circle/Sphere.
+
+    """
+
+    if isinstance(particles, ParticleSet):
+        return particles.array(), particles.dim
+
+    if not isinstance(particles, np.ndarray):
+        particles = list(particles)
+        if particles and hasattr(particles[0], 'd'):  # Circle/Sphere
+            if dim is None:
+                dim = 3 if hasattr(particles[0], 'z') else 2
+            ps = ParticleSet(dim=dim)
+            ps.extend(particles)
+            return ps.array(), dim
+
+    return np.asarray(particles, dtype=np.float64).reshape(-1, 4), dim or 3
+
+
+def periodic_images(points, radii, edge):
+    """
+    Периодические образы частиц, пересекающих грани матрицы с ребром
+    edge: центры, радиусы и номера исходных частиц (сами частицы идут
+    первыми).
+
+    """
+
+    dim = points.shape[1]
+    centres, sizes, numbers = [points], [radii], [np.arange(len(radii))]
+
+    for offset in itertools.product((-1, 0, 1), repeat=dim):
+        if not any(offset):
+            continue
+        shifted = points + edge * np.array(offset)
+        near = np.all((shifted - radii[:, None] < edge) &
+                      (shifted + radii[:, None] > 0), axis=1)
+        centres.append(shifted[near])
+        sizes.append(radii[near])
+        numbers.append(np.flatnonzero(near))
+
+    return np.concatenate(centres), np.concatenate(sizes), \
+        np.concatenate(numbers)
 
 
 if __name__ == '__main__':
@@ -154,3 +396,9 @@ if __name__ == '__main__':
 
     s = Sphere()
     print(s, s.space(), s.crossing(cm.edge), sep='\n')
+
+    ps = ParticleSet(dim=3)
+    ps.append(s, fraction=0)
+    ps.add(10., 20., 30., 5.)
+    ps.extend(ps[:1])
+    print(ps, ps[1], ps.array(), sep='\n')
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль триангуляции частиц и экспорта в форматы STL и OBJ
+"""
+
+import numpy as np
+import shapes
+
+# запись треугольника двоичного STL
+STL_TRIANGLE = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)),
+                         ('attribute', '<u2')])
+
+
+def unit_sphere(level=2):
+    """
+    Триангуляция единичной сферы (икосаэдр, каждая грань которого
+    level раз делится на 4): вершины V x 3 и грани F x 3.
+
+    """
+
+    t = (1 + np.sqrt(5.)) / 2
+    vertices = np.array([
+        [-1, t, 0], [1, t, 0], [-1, -t, 0], [1, -t, 0],
+        [0, -1, t], [0, 1, t], [0, -1, -t], [0, 1, -t],
+        [t, 0, -1], [t, 0, 1], [-t, 0, -1], [-t, 0, 1]], dtype=np.float64)
+    faces = np.array([
+        [0, 11, 5], [0, 5, 1], [0, 1, 7], [0, 7, 10], [0, 10, 11],
+        [1, 5, 9], [5, 11, 4], [11, 10, 2], [10, 7, 6], [7, 1, 8],
+        [3, 9, 4], [3, 4, 2], [3, 2, 6], [3, 6, 8], [3, 8, 9],
+        [4, 9, 5], [2, 4, 11], [6, 2, 10], [8, 6, 7], [9, 8, 1]])
+    vertices /= np.linalg.norm(vertices, axis=1)[:, None]
+
+    for _ in range(level):
+        # середины рёбер (каждое ребро - один раз)
+        edges = np.sort(np.concatenate(
+            (faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]])), axis=1)
+        edges, inverse = np.unique(edges, axis=0, return_inverse=True)
+        middle = vertices[edges].mean(axis=1)
+        middle /= np.linalg.norm(middle, axis=1)[:, None]
+
+        a, b, c = faces.T
+        ab, bc, ca = inverse.ravel().reshape(3, -1) + len(vertices)
+        faces = np.concatenate((
+            np.column_stack((a, ab, ca)), np.column_stack((b, bc, ab)),
+            np.column_stack((c, ca, bc)), np.column_stack((ab, bc, ca))))
+        vertices = np.concatenate((vertices, middle))
+
+    return vertices, faces
+
+
+def unit_circle(level=2):
+    """
+    Триангуляция единичного круга в плоскости z = 0 (веер из
+    10 * 2 ** level треугольников): вершины V x 3 и грани F x 3.
+
+    """
+
+    segments = 10 * 2 ** level
+    angle = 2 * np.pi * np.arange(segments) / segments
+    vertices = np.column_stack((
+        np.concatenate(([0.], np.cos(angle))),
+        np.concatenate(([0.], np.sin(angle))), np.zeros(segments + 1)))
+    ring = np.arange(1, segments + 1)
+    faces = np.column_stack((np.zeros(segments, dtype=np.int64), ring,
+                             np.roll(ring, -1)))
+
+    return vertices, faces
+
+
+def template(dim, level=2):
+    """Триангуляция единичной частицы: сфера (3D) либо круг (2D)."""
+
+    return unit_sphere(level) if dim == 3 else unit_circle(level)
+
+
+def triangles(particles, dim=None, level=2, chunk=2 ** 20):
+    """
+    Треугольники частиц пакетами не более ~chunk вершин (генератор
+    массивов вершин треугольников k x 3 x 3).
+
+    Все частицы получаются масштабированием и переносом общей
+    триангуляции единичной частицы.
+
+    """
+
+    array, dim = shapes.particle_array(particles, dim)
+    vertices, faces = template(dim, level)
+    corners = vertices[faces]  # F x 3 x 3
+    batch = max(1, chunk // len(vertices))
+
+    for low in range(0, len(array), batch):
+        part = array[low:low + batch]
+        centres = part[:, :3].copy()
+        if dim == 2:
+            centres[:, 2] = 0.
+        yield (centres[:, None, None, :] + part[:, 3, None, None, None] / 2 *
+               corners[None]).reshape(-1, 3, 3)
+
+
+def box(matrix_edge, dim=3):
+    """Треугольники граней матрицы (куб либо квадрат в плоскости z = 0)."""
+
+    e = matrix_edge
+    if dim == 2:
+        return np.array([[[0, 0, 0], [e, 0, 0], [e, e, 0]],
+                         [[0, 0, 0], [e, e, 0], [0, e, 0]]], dtype=np.float64)
+
+    corners = np.array([[x, y, z] for x in (0, e) for y in (0, e)
+                        for z in (0, e)], dtype=np.float64)
+    faces = np.array([
+        [0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5],  # x = 0, x = e
+        [0, 4, 5], [0, 5, 1], [2, 3, 7], [2, 7, 6],  # y = 0, y = e
+        [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3]])  # z = 0, z = e
+
+    return corners[faces]
+
+
+def _normals(corners):
+    """Единичные нормали треугольников k x 3 x 3."""
+
+    normals = np.cross(corners[:, 1] - corners[:, 0],
+                       corners[:, 2] - corners[:, 0])
+    length = np.linalg.norm(normals, axis=1)
+
+    return normals / np.where(length > 0, length, 1.)[:, None]
+
+
+def write_stl(file, particles, dim=None, level=2, matrix_edge=None,
+              chunk=2 ** 20):
+    """
+    Записать частицы (и при заданном matrix_edge - грани матрицы)
+    в двоичный файл STL пакетами не более ~chunk вершин.
+
+    Возвращает кол-во треугольников.
+
+    """
+
+    array, dim = shapes.particle_array(particles, dim)
+    vertices, faces = template(dim, level)
+    # нормали общей триангуляции (не меняются при масштабировании и
+    # переносе частиц)
+    normals = _normals(vertices[faces])
+    extra = box(matrix_edge, dim) if matrix_edge is not None else \
+        np.empty((0, 3, 3))
+    count = len(array) * len(faces) + len(extra)
+
+    with open(file, 'wb') as f:
+        f.write(b'Microstructure binary STL'.ljust(80, b' '))
+        f.write(np.array([count], dtype='<u4').tobytes())
+
+        if len(extra):  # грани матрицы
+            record = np.zeros(len(extra), dtype=STL_TRIANGLE)
+            record['normal'] = _normals(extra)
+            record['vertices'] = extra
+            f.write(record.tobytes())
+
+        for corners in triangles(array, dim, level, chunk):
+            record = np.zeros(len(corners), dtype=STL_TRIANGLE)
+            record['normal'] = np.tile(normals, (len(corners) //
+                                                 len(faces), 1))
+            record['vertices'] = corners
+            f.write(record.tobytes())
+
+    return count
+
+
+def write_obj(file, particles, dim=None, level=2, matrix_edge=None,
+              chunk=2 ** 20):
+    """
+    Записать частицы (и при заданном matrix_edge - грани матрицы)
+    в текстовый файл OBJ пакетами не более ~chunk вершин; вершины
+    общей триангуляции частицы не дублируются.
+
+    Возвращает кол-во вершин и граней.
+
+    """
+
+    array, dim = shapes.particle_array(particles, dim)
+    vertices, faces = template(dim, level)
+    batch = max(1, chunk // len(vertices))
+
+    count_vertices = count_faces = 0
+    with open(file, 'w') as f:
+        f.write('# Microstructure OBJ\n')
+
+        if matrix_edge is not None:
+            corners = box(matrix_edge, dim).reshape(-1, 3)
+            f.write('o matrix\n')
+            f.write(('v %.9g %.9g %.9g\n' * len(corners)) %
+                    tuple(corners.ravel()))
+            f.write(('f %d %d %d\n' * (len(corners) // 3)) %
+                    tuple(np.arange(1, len(corners) + 1)))
+            count_vertices += len(corners)
+            count_faces += len(corners) // 3
+            f.write('o particles\n')
+
+        for low in range(0, len(array), batch):
+            part = array[low:low + batch]
+            centres = part[:, :3].copy()
+            if dim == 2:
+                centres[:, 2] = 0.
+            points = (centres[:, None, :] + part[:, 3, None, None] / 2 *
+                      vertices[None]).reshape(-1, 3)
+            numbers = (faces[None] + count_vertices + 1 + len(vertices) *
+                       np.arange(len(part))[:, None, None]).reshape(-1, 3)
+
+            f.write(('v %.9g %.9g %.9g\n' * len(points)) %
+                    tuple(points.ravel()))
+            f.write(('f %d %d %d\n' * len(numbers)) % tuple(numbers.ravel()))
+            count_vertices += len(points)
+            count_faces += len(numbers)
+
+    return count_vertices, count_faces
+
+
+def write(file, particles, dim=None, level=2, matrix_edge=None,
+          chunk=2 ** 20):
+    """Записать частицы в файл: .obj - OBJ, иначе - двоичный STL."""
+
+    if file.lower().endswith('.obj'):
+        return write_obj(file, particles, dim, level, matrix_edge, chunk)
+
+    return write_stl(file, particles, dim, level, matrix_edge, chunk)
+
+
+if __name__ == '__main__':
+
+    import os
+    import tempfile
+
+    for lod in range(4):
+        v, f = unit_sphere(lod)
+        print('level={0}: vertices={1}, faces={2}'.format(lod, len(v), len(f)))
+
+    n = 2000
+    rng = np.random.default_rng(1)
+    spheres = np.column_stack((rng.random((n, 3)) * 100.,
+                               rng.random(n) * 2. + 2.))
+
+    for name in ('particles.stl', 'particles.obj'):
+        path = os.path.join(tempfile.gettempdir(), name)
+        result = write(path, spheres, level=1, matrix_edge=100.)
+        print(name, result,
+              '{0:.1f} MB'.format(os.path.getsize(path) / 2 ** 20))
+        os.remove(path)
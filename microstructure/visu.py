@@ -5,36 +5,33 @@
 Модуль визуализации данных
 """
 
-import matplotlib.patches as patches
+from matplotlib.collections import EllipseCollection
 import matplotlib.pyplot as plt
 import numpy as np
 
+LOD = 200000  # наибольшее кол-во изображаемых на виде частиц
+
 
 class View:
     """Вид"""
 
-    def __init__(self, data, matrix_edge):
+    def __init__(self, data, matrix_edge, lod=LOD):
         self.data = data
         self.matrix_edge = matrix_edge
+        self.lod = lod  # None - изображаются все частицы
         self.array = None
         self.circles_options = {
-            'fill': True, 'edgecolor': 'black', 'facecolor': 'orange',
-            'alpha': 0.7}
+            'edgecolors': 'black', 'facecolors': 'orange', 'alpha': 0.7,
+            'linewidths': 0.5}
 
         self.data_preparation()
 
     def data_preparation(self):
-        data_list = []
-        for i in self.data:
-            if 'z' in i.__dict__:  # 3D
-                data_list.append((i.x, i.y, i.z, i.d))
-            else:  # 2D
-                data_list.append((i.x, i.y, 0., i.d))
-
-        self.array = np.array(
-            data_list, dtype=[
-                ('x', np.float64), ('y', np.float64),
-                ('z', np.float64), ('d', np.float64)])
+        """Структурированный массив по набору частиц ParticleSet."""
+
+        self.array = np.rec.fromarrays(
+            [self.data.x, self.data.y, self.data.z, self.data.d],
+            names='x, y, z, d')
 
     def limits(self):
         plt.xlim(0, self.matrix_edge)
@@ -44,76 +41,94 @@ class View:
         plt.xlabel(abscissa)
         plt.ylabel(ordinate)
 
+    def visible(self, depth):
+        """
+        Частицы в порядке изображения (по возрастанию глубины depth -
+        ближние к наблюдателю рисуются последними). При числе частиц
+        больше lod изображаются только lod ближних к наблюдателю.
+
+        """
+
+        self.array.sort(order=depth)
+
+        if self.lod is not None and len(self.array) > self.lod:
+            return self.array[-self.lod:]
+
+        return self.array
+
+    def draw(self, axes, abscissa, ordinate, depth):
+        """Изобразить частицы одной коллекцией кругов."""
+
+        array = self.visible(depth)
+
+        circles = EllipseCollection(
+            widths=array['d'], heights=array['d'], angles=0., units='xy',
+            offsets=np.column_stack((array[abscissa], array[ordinate])),
+            offset_transform=axes.transData, **self.circles_options)
+        axes.add_collection(circles)
+
+        return circles
+
 
 class FrontView(View):
     """Вид спереди (x-y)"""
 
-    def __init__(self, axes, data, matrix_edge):
-        super().__init__(data, matrix_edge)
+    def __init__(self, axes, data, matrix_edge, lod=LOD):
+        super().__init__(data, matrix_edge, lod)
 
         self.ax = axes
 
         self.limits()
         self.labels(abscissa='X', ordinate='Y')
 
-        self.array.sort(order='z')
-
-        for x, y, _, d in self.array:
-            cir = patches.Circle((x, y), radius=d/2, **self.circles_options)
-            self.ax.add_patch(cir)
+        self.draw(self.ax, 'x', 'y', depth='z')
 
 
 class RightView(View):
     """Вид справа (y-z)"""
 
-    def __init__(self, axes, data, matrix_edge):
-        super().__init__(data, matrix_edge)
+    def __init__(self, axes, data, matrix_edge, lod=LOD):
+        super().__init__(data, matrix_edge, lod)
 
         self.ax = axes
 
         self.limits()
         self.labels(abscissa='Y', ordinate='Z')
 
-        self.array.sort(order='x')
-
-        for _, y, z, d in self.array:
-            cir = patches.Circle((y, z), radius=d/2, **self.circles_options)
-            self.ax.add_patch(cir)
+        self.draw(self.ax, 'y', 'z', depth='x')
 
 
 class TopView(View):
     """Вид сверху (z-x)"""
 
-    def __init__(self, axes, data, matrix_edge):
-        super().__init__(data, matrix_edge)
+    def __init__(self, axes, data, matrix_edge, lod=LOD):
+        super().__init__(data, matrix_edge, lod)
 
         self.ax = axes
 
         self.limits()
         self.labels(abscissa='Z', ordinate='X')
 
-        self.array.sort(order='y')
-
-        for x, _, z, d in self.array:
-            cir = patches.Circle((z, x), radius=d/2, **self.circles_options)
-            self.ax.add_patch(cir)
+        self.draw(self.ax, 'z', 'x', depth='y')
 
 
 class View3D:
     """View3D."""
 
-    def __init__(self, edge, data):
+    def __init__(self, edge, data, title=None, lod=LOD):
         plt.close('all')
         fig = plt.figure(num='Микроструктура', figsize=(7, 7), dpi=100)
+        if title:
+            fig.suptitle(title, fontsize='small')
 
         ax1 = fig.add_subplot(2, 2, 1)
-        RightView(axes=ax1, data=data, matrix_edge=edge)
+        RightView(axes=ax1, data=data, matrix_edge=edge, lod=lod)
 
         ax2 = fig.add_subplot(2, 2, 2)
-        FrontView(axes=ax2, data=data, matrix_edge=edge)
+        FrontView(axes=ax2, data=data, matrix_edge=edge, lod=lod)
 
         ax3 = fig.add_subplot(2, 2, 4)
-        TopView(axes=ax3, data=data, matrix_edge=edge)
+        TopView(axes=ax3, data=data, matrix_edge=edge, lod=lod)
 
         plt.tight_layout()
         plt.show()
@@ -122,12 +137,14 @@ class View3D:
 class View2D:
     """View2D."""
 
-    def __init__(self, edge, data):
+    def __init__(self, edge, data, title=None, lod=LOD):
         plt.close('all')
         plt.figure(num='Микроструктура', figsize=(7, 7), dpi=100)
 
         ax = plt.axes()
-        FrontView(axes=ax, data=data, matrix_edge=edge)
+        if title:
+            ax.set_title(title, fontsize='small')
+        FrontView(axes=ax, data=data, matrix_edge=edge, lod=lod)
 
         plt.tight_layout()
         plt.show()
@@ -139,12 +156,14 @@ if __name__ == '__main__':
 
     m = shapes.CubeMatrix(edge=100.)
 
-    p1 = shapes.Sphere(x=0., y=20., z=40., d=10.)
-    p2 = shapes.Sphere(x=50., y=50., z=50., d=20.)
+    spheres = shapes.ParticleSet(dim=3)
+    spheres.add(0., 20., 40., 10.)
+    spheres.add(50., 50., 50., 20.)
 
-    View3D(m.edge, [p1, p2])
+    View3D(m.edge, spheres)
 
-    p3 = shapes.Circle(x=10., y=40, d=30.)
-    p4 = shapes.Circle(x=50., y=75., d=15.)
+    circles = shapes.ParticleSet(dim=2)
+    circles.add(10., 40., 0., 30.)
+    circles.add(50., 75., 0., 15.)
 
-    View2D(m.edge, [p3, p4])
+    View2D(m.edge, circles)
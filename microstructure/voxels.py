@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль воксельного представления распределений частиц
+"""
+
+import time
+import numpy as np
+import fill_deg
+import shapes
+
+
+class VoxelReport:
+    """Результат воксельного представления распределения частиц."""
+
+    def __init__(self):
+        self.shape = ()  # размеры массива вокселей
+        self.voxel_size = 0.  # ребро вокселя
+        self.diameters = np.empty(0)  # диаметры фракций (метки 1, 2, ...)
+        self.voxel = {}  # степень заполнения по вокселям {d: KV}
+        self.analytic = {}  # точная степень заполнения {d: KV} (fill_deg)
+        self.elapsed = 0.
+
+    def __str__(self):
+        lines = ['voxels: shape={0}, size={1:.4g}, time={2:.2f} s'.format(
+            self.shape, self.voxel_size, self.elapsed)]
+        for d in self.analytic:
+            lines.append('d={0:g}: KV voxel={1:.5f}, analytic={2:.5f}'.format(
+                d, self.voxel.get(d, 0.), self.analytic[d]))
+        lines.append('ALL: KV voxel={0:.5f}, analytic={1:.5f}'.format(
+            sum(self.voxel.values()), sum(self.analytic.values())))
+
+        return '\n'.join(lines)
+
+
+def voxelize(particles, matrix_edge, resolution, dim=None, file=None,
+             labels='fraction', periodic=False, slab=None, chunk=2 ** 22):
+    """
+    Воксельное представление распределения частиц (ParticleSet, список
+    объектов Circle/Sphere либо массив строк x, y, z, d) в матрице с
+    ребром matrix_edge, разбитой на resolution вокселей по каждой оси.
+
+    Матрице соответствует метка 0, частице - номер её фракции (1, 2, ...
+    по возрастанию диаметра; labels='fraction') либо номер частицы + 1
+    (labels='id'). Массив упорядочен как стопка изображений: [z, y, x]
+    (в 2D - [y, x]). При заданном файле file (.npy) массив создаётся
+    отображённым в память (np.lib.format.open_memmap), т.е. на диске.
+
+    Массив заполняется слоями по последней оси толщиной slab вокселей
+    (по умолчанию - около 64 МБ); в слое для каждой частицы
+    перебираются только воксели её габаритного прямоугольника, частицы
+    с одинаковыми габаритами обрабатываются пакетами не более ~chunk
+    вокселей. Возвращает массив вокселей и отчёт VoxelReport.
+
+    """
+
+    start = time.perf_counter()
+
+    array, dim = shapes.particle_array(particles, dim)
+    points = np.ascontiguousarray(array[:, :dim])
+    diameters = array[:, 3]
+
+    report = VoxelReport()
+    report.diameters, fraction = np.unique(diameters, return_inverse=True)
+    fraction = fraction.ravel()
+
+    if labels == 'fraction':
+        values = fraction + 1
+        dtype = np.uint8 if len(report.diameters) < 2 ** 8 else np.uint16
+    else:
+        values = np.arange(1, len(diameters) + 1)
+        dtype = np.uint32
+    values = values.astype(dtype)
+
+    # объём вокселей: [z, y, x]
+    shape = (resolution,) * dim
+    if file is None:
+        volume = np.zeros(shape, dtype=dtype)
+    else:
+        volume = np.lib.format.open_memmap(file, mode='w+', dtype=dtype,
+                                           shape=shape)
+    size = matrix_edge / resolution
+    report.shape = shape
+    report.voxel_size = size
+
+    if periodic:
+        centres, radii, numbers = shapes.periodic_images(
+            points, diameters / 2, matrix_edge)
+    else:
+        centres, radii, numbers = points, diameters / 2, \
+            np.arange(len(diameters))
+
+    # воксели, центры которых могут попасть в частицы
+    low = np.maximum(np.ceil((centres - radii[:, None]) / size - 0.5), 0)
+    high = np.minimum(np.floor((centres + radii[:, None]) / size - 0.5),
+                      resolution - 1)
+    keep = np.all(low <= high, axis=1)
+    centres, radii, numbers = centres[keep], radii[keep], numbers[keep]
+    low = low[keep].astype(np.int64)
+    high = high[keep].astype(np.int64)
+    extent = np.max(high - low, axis=1) + 1 if len(radii) else \
+        np.empty(0, dtype=np.int64)
+
+    # частицы по возрастанию первого слоя
+    order = np.argsort(low[:, -1], kind='stable')
+    centres, radii, numbers = centres[order], radii[order], numbers[order]
+    low, high, extent = low[order], high[order], extent[order]
+    widest = int(extent.max()) if len(extent) else 1
+
+    if slab is None:
+        slab = max(1, 2 ** 26 // (np.dtype(dtype).itemsize *
+                                  resolution ** (dim - 1)))
+
+    counts = np.zeros(len(report.diameters) + 1, dtype=np.int64)
+    for first in range(0, resolution, slab):
+        last = min(first + slab, resolution)
+        layer = volume[first:last]
+
+        lo, hi = np.searchsorted(low[:, -1], (first - widest + 1, last))
+        in_slab = lo + np.flatnonzero(high[lo:hi, -1] >= first)
+
+        for m in np.unique(extent[in_slab]):
+            group = in_slab[extent[in_slab] == m]
+            batch = max(1, chunk // m ** dim)
+
+            for k in range(0, len(group), batch):
+                part = group[k:k + batch]
+
+                # номера вокселей габаритов по осям (b x dim x m) и
+                # квадраты расстояний до центров (вне габаритов - inf)
+                index = low[part][:, :, None] + np.arange(m)
+                valid = index <= high[part][:, :, None]
+                valid[:, -1] &= (index[:, -1] >= first) & \
+                    (index[:, -1] < last)
+                squared = np.where(
+                    valid, ((index + 0.5) * size -
+                            centres[part][:, :, None]) ** 2, np.inf)
+
+                # сумма квадратов по осям (b x m x ... x m)
+                total = 0.
+                for axis in range(dim):
+                    shape_ = [len(part)] + [1] * dim
+                    shape_[axis + 1] = m
+                    total = total + squared[:, axis].reshape(shape_)
+                inside = np.nonzero(
+                    total <= radii[part].reshape([-1] + [1] * dim) ** 2)
+
+                particle = inside[0]
+                voxel = [index[particle, axis, inside[axis + 1]]
+                         for axis in range(dim)]
+                voxel[-1] = voxel[-1] - first
+                layer[tuple(voxel[::-1])] = values[numbers[part][particle]]
+
+        if labels == 'fraction':
+            counts += np.bincount(np.asarray(layer).ravel(),
+                                  minlength=len(counts))
+        else:
+            ids, number = np.unique(np.asarray(layer), return_counts=True)
+            nonzero = ids > 0
+            counts[0] += number[~nonzero].sum()
+            np.add.at(counts, fraction[ids[nonzero].astype(np.int64) - 1] + 1,
+                      number[nonzero])
+
+    if file is not None:
+        volume.flush()
+
+    matrix = shapes.SquareMatrix(edge=matrix_edge) if dim == 2 else \
+        shapes.CubeMatrix(edge=matrix_edge)
+    report.voxel = {d: counts[k + 1] / volume.size
+                    for k, d in enumerate(report.diameters.tolist())}
+    report.analytic = {
+        d: fill_deg.filling(matrix, value) for d, value in
+        fill_deg.fractions_spaces(matrix, points, diameters,
+                                  periodic).items()}
+    report.elapsed = time.perf_counter() - start
+
+    return volume, report
+
+
+if __name__ == '__main__':
+
+    import os
+    import tempfile
+
+    circles = [shapes.Circle(x=50., y=50., d=40.), shapes.Circle(x=0., y=0.,
+                                                                 d=20.)]
+    image, rep = voxelize(circles, 100., 20)
+    print(image)
+    print(rep)
+
+    # случайные шары пересекаются, поэтому заполнение по вокселям меньше
+    n = 2000
+    rng = np.random.default_rng(1)
+    spheres = np.column_stack((rng.random((n, 3)) * 100.,
+                               rng.choice([2., 4.], n)))
+
+    name = os.path.join(tempfile.gettempdir(), 'voxels.npy')
+    volume_, rep = voxelize(spheres, 100., 64, file=name, periodic=True)
+    print(rep)
+
+    del volume_
+    print(np.load(name, mmap_mode='r').shape)
+    os.remove(name)